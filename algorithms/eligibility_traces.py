@@ -0,0 +1,67 @@
+class SparseTraces:
+    """
+        Eligibility traces of the parameters (action values or weights) recently updated by an agent
+        Only the traces of the recently visited parameters are stored, in a dictionary of parameter index to trace,
+        the traces decay by a constant factor after every update and are dropped once their magnitude is below a
+        cutoff, so that an update takes time in the number of active traces instead of the number of parameters
+    """
+
+    def __init__(self, decay, cutoff=0.01):
+        """
+            Constructor for SparseTraces
+
+        :param decay: Factor of the decay of the traces after every update, γλ
+        :param cutoff: Traces whose magnitude is below cutoff are dropped (optional)
+        """
+
+        self.decay = decay
+        self.cutoff = cutoff
+        self.traces = {}
+
+    def __len__(self):
+        """
+            Method to get the number of active traces
+
+        :return: number of active traces
+        """
+
+        return len(self.traces)
+
+    def clear(self):
+        """
+            Method to drop all the traces, e.g. at the start of an episode
+
+        :return: None
+        """
+
+        self.traces.clear()
+
+    def replace(self, indices, values):
+        """
+            Method to set the traces of parameters to values (replacing traces), e.g. to 1 for the visited state and
+            action of a Q-table, or to the features of the visited state and action for linear approximation
+
+        :param indices: Indices of the parameters
+        :param values: Values of the traces
+        :return: None
+        """
+
+        self.traces.update(zip(indices, values))
+
+    def update(self, parameters, step):
+        """
+            Method to update the parameters with their traces, and decay the traces
+            Algorithm:
+                1. for every active trace e_i: θi ← θi + step * e_i
+                2. decay the traces e_i ← γλ e_i, and drop the traces whose magnitude is below the cutoff
+
+        :param parameters: Flat numpy array of the parameters, updated in place
+        :param step: Learning rate times temporal difference, αδ
+        :return: None
+        """
+
+        for i, trace in self.traces.items():
+            parameters[i] += step * trace
+
+        self.traces = {i: trace * self.decay for i, trace in self.traces.items()
+                       if abs(trace * self.decay) >= self.cutoff}
@@ -49,3 +49,28 @@ class EpsilonGreedySelection:
         max_value = np.max(actions)
         max_indices = np.flatnonzero(max_value == actions)
         return self.random_state.choice(max_indices)
+
+    def select_batch(self, action_values):
+        """
+            Method to select an action for each row of action values at once
+            Algorithm:
+                1. Generate a uniform random number for each row using a uniform distribution between 0 and 1
+                2. The rows with a random number less than epsilon (an array gives the epsilon of each row) pick
+                   a random action
+                3. The other rows pick the greedy action that maximizes the value, ties are broken at random by
+                   picking the action with the largest uniform random number among the actions with maximum value
+
+        :param action_values: Action values represented in an array of shape n_rows * n_actions
+        :return: array of the actions selected by epsilon-greedy
+        """
+
+        n_rows, n_actions = np.shape(action_values)
+
+        explore = self.random_state.uniform(0, 1, n_rows) < self.epsilon
+        random_actions = self.random_state.randint(0, n_actions, n_rows)
+
+        max_actions = action_values == np.max(action_values, axis=1, keepdims=True)
+        greedy_actions = np.argmax(np.where(max_actions, self.random_state.uniform(0, 1, (n_rows, n_actions)), -1),
+                                   axis=1)
+
+        return np.where(explore, random_actions, greedy_actions)
@@ -1,5 +1,7 @@
 import numpy as np
 
+from env.precision import float_dtype, policy_dtype
+
 
 class LinearWrapper:
     """
@@ -31,13 +33,31 @@ class LinearWrapper:
         :return: features of the encoded state
         """
 
-        features = np.zeros((self.n_actions, self.n_features))
+        features = np.zeros((self.n_actions, self.n_features), dtype=float_dtype())
         for a in range(self.n_actions):
             i = np.ravel_multi_index((s, a), (self.n_states, self.n_actions))
             features[a, i] = 1.0
 
         return features
 
+    def encode_states(self, states):
+        """
+            Method for encoding a batch of states into feature matrices at once, the same features as encode_state()
+            for each state
+
+        :param states: Array of the states for which encoding should be performed
+        :return: features of the encoded states as an array of shape n_states_in_batch * n_actions * n_features
+        """
+
+        states = np.asarray(states)
+        actions = np.arange(self.n_actions)
+
+        features = np.zeros((len(states), self.n_actions, self.n_features), dtype=float_dtype())
+        features[np.arange(len(states)).reshape(-1, 1), actions,
+                 np.ravel_multi_index((states.reshape(-1, 1), actions), (self.n_states, self.n_actions))] = 1.0
+
+        return features
+
     def decode_policy(self, theta):
         """
             Method to decode the theta and extract the policy and value
@@ -46,8 +66,8 @@ class LinearWrapper:
         :return: policy and value decoded
         """
 
-        policy = np.zeros(self.env.n_states, dtype=int)
-        value = np.zeros(self.env.n_states)
+        policy = np.zeros(self.env.n_states, dtype=policy_dtype(self.n_actions))
+        value = np.zeros(self.env.n_states, dtype=float_dtype())
 
         for s in range(self.n_states):
             features = self.encode_state(s)
@@ -1,27 +1,384 @@
+import heapq
+
 import numpy as np
 
+from env.env_helper import block_indices, coarsen_lake
+from env.frozenlake_environment import FrozenLake
+from env.precision import float_dtype, policy_dtype
+
+
+def _state_action_values(env):
+    """
+        Method to get a function that calculates the values of all actions of a state (or an array of states)
+        for a value array
+            Q(s, a) = R(s, a) + γ Σs′ p(s′|s, a) V(s′)
+        Uses the expected rewards R of the environment (see EnvironmentModel.get_expected_rewards()), and the sparse
+        successor tables if the environment was created with sparse=True, else the dense probabilities, so that the
+        planners work with both model representations. If the model is calculated on the fly, the successors of the
+        states are calculated on every call instead (see Environment.get_successor_rows())
+
+    :param env: Environment for which the action values should be calculated
+    :return: function of state, value and gamma that returns the action values of the state as an array
+    """
+
+    if env.representation == 'on_the_fly':
+        def action_values(s, value, gamma):
+            successors, p, r = env.get_successor_rows(np.reshape(s, -1))
+            q = np.sum(p * r, axis=2) + (gamma * np.sum(p * value[successors], axis=2))
+            return q.reshape(np.shape(s) + (env.n_actions,))
+
+        return action_values
+
+    expected_r = env.get_expected_rewards()
+
+    if env.sparse:
+        successors, p, _ = env.get_sparse_prob_rewards()
+        return lambda s, value, gamma: expected_r[s] + (gamma * np.sum(p[s] * value[successors[s]], axis=-1))
+
+    p, _ = env.get_prob_rewards()
+    return lambda s, value, gamma: expected_r[s] + (gamma * np.dot(value, p[s]))
+
+
+def _action_values(env):
+    """
+        Method to get a function that calculates the values of all actions of all states at once for a value array,
+        every call is a single tensor contraction of the probabilities with the value array
+            Q(s, a) = R(s, a) + γ Σs′ p(s′|s, a) V(s′)
+        If the model is calculated on the fly, every call is a set of stencil operations on the grid of the
+        environment instead (see Environment.get_action_values())
+
+    :param env: Environment for which the action values should be calculated
+    :return: function of value and gamma that returns the action values as an array of shape n_states * n_actions
+    """
+
+    if env.representation == 'on_the_fly':
+        return env.get_action_values
+
+    expected_r = env.get_expected_rewards()
+
+    if env.sparse:
+        successors, p, _ = env.get_sparse_prob_rewards()
+        return lambda value, gamma: expected_r + (gamma * np.sum(p * value[successors], axis=2))
+
+    p, _ = env.get_prob_rewards()
+    return lambda value, gamma: expected_r + (gamma * np.matmul(value, p))
+
+
+def _policy_transitions(env, policy):
+    """
+        Method to get a function that calculates the expected next value of all states under a policy for a value array
+        The probabilities of the action chosen by the policy are selected once, so that every call is a single
+        matrix-vector product with the transition matrix of the policy
+            (P_π V)(s) = Σs′ p(s′|s, π(s)) V(s′)
+
+    :param env: Environment for which the expected next values should be calculated
+    :param policy: Policy that chooses the actions
+    :return: function of value that returns the expected next values as an array
+    """
+
+    states = np.arange(env.n_states)
+
+    if env.representation == 'on_the_fly':
+        expected_r = env.get_action_values(np.zeros(env.n_states, dtype=float_dtype()), 1.)[states, policy]
+        return lambda value: env.get_action_values(value, 1.)[states, policy] - expected_r
+
+    if env.sparse:
+        successors, p, _ = env.get_sparse_prob_rewards()
+        successors, p = successors[states, policy], p[states, policy]
+        return lambda value: np.sum(p * value[successors], axis=1)
+
+    p, _ = env.get_prob_rewards()
+    p = p[states, :, policy]
+    return lambda value: np.dot(p, value)
+
+
+def _policy_values(env, policy):
+    """
+        Method to get a function that calculates the values of all states under a policy at once for a value array
+            V(s) = R(s, π(s)) + γ Σs′ p(s′|s, π(s)) V(s′)
+
+    :param env: Environment for which the values should be calculated
+    :param policy: Policy that has to be evaluated
+    :return: function of value and gamma that returns the values of the policy as an array
+    """
+
+    if env.representation == 'on_the_fly':
+        states = np.arange(env.n_states)
+        return lambda value, gamma: env.get_action_values(value, gamma)[states, policy]
+
+    expected_r = env.get_expected_rewards()[np.arange(env.n_states), policy]
+    transitions = _policy_transitions(env, policy)
+
+    return lambda value, gamma: expected_r + (gamma * transitions(value))
+
+
+def _selected_action_values(env, states, actions):
+    """
+        Method to get a function that calculates the values of selected pairs of states and actions for a value array
+        The probabilities and expected rewards of the pairs are selected once, so that the values of actions that are
+        not selected are never calculated
+            Q(s, a) = R(s, a) + γ Σs′ p(s′|s, a) V(s′)
+
+    :param env: Environment for which the action values should be calculated
+    :param states: Array of the states of the pairs
+    :param actions: Array of the actions of the pairs
+    :return: function of value and gamma that returns the values of the pairs as an array
+    """
+
+    if env.representation == 'on_the_fly':
+        successors, p, r = (rows[np.arange(len(states)), actions] for rows in env.get_successor_rows(states))
+        expected_r = np.sum(p * r, axis=1)
+        return lambda value, gamma: expected_r + (gamma * np.sum(p * value[successors], axis=1))
 
-def policy_evaluation(env, policy, gamma, theta, max_iterations):
+    expected_r = env.get_expected_rewards()[states, actions]
+
+    if env.sparse:
+        successors, p, _ = env.get_sparse_prob_rewards()
+        successors, p = successors[states, actions], p[states, actions]
+        return lambda value, gamma: expected_r + (gamma * np.sum(p * value[successors], axis=1))
+
+    p, _ = env.get_prob_rewards()
+    p = p[states, :, actions]
+    return lambda value, gamma: expected_r + (gamma * np.dot(p, value))
+
+
+def _states_reaching(env, targets):
+    """
+        Method to find the states from which any of the target states is reached with a probability greater than 0
+        Searches backwards from the targets one level of the predecessor index at a time
+        (see EnvironmentModel.get_predecessors())
+
+    :param env: Environment in which the states should be found
+    :param targets: Array of the target states
+    :return: boolean array of size number of states, True for the states reaching a target (targets included)
+    """
+
+    indptr, predecessors = env.get_predecessors()
+
+    reached = np.zeros(env.n_states, dtype=bool)
+    reached[targets] = True
+    frontier = np.flatnonzero(reached)
+
+    while frontier.size:
+        starts, counts = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        states = predecessors[offsets + np.arange(offsets.size)]
+
+        frontier = np.unique(states[~reached[states]])
+        reached[frontier] = True
+
+    return reached
+
+
+def _strongly_connected_components(env):
+    """
+        Method to decompose the transition graph of the environment into strongly connected components, there is an
+        edge from a state to each state it reaches with a probability greater than 0 by any action
+        The components are numbered in reverse topological order, a component only reaches components with a
+        smaller index
+        Algorithm:
+            1. trim: a state without edges from or to the other remaining states (e.g. a hole, whose only successor
+               is the absorbing state) is a component by itself, repeat with whole graph numpy operations until there
+               are none left. The states without edges to the remaining states are numbered first in the order they
+               are trimmed, the states without edges from the remaining states are numbered last in the reverse order
+            2. find the components of the remaining states with an iterative version of Tarjan's algorithm, which
+               finds a component after all the components it reaches
+
+    :param env: Environment for which the components should be found
+    :return: array of the index of the component of each state
+    """
+
+    successors, p, _ = env.get_sparse_prob_rewards()
+
+    states = np.broadcast_to(np.arange(env.n_states).reshape(-1, 1, 1), successors.shape)
+    sources, targets = states[p > 0], successors[p > 0]
+    sources, targets = sources[sources != targets], targets[sources != targets]
+
+    components = np.full(env.n_states, -1, dtype=int)
+    remaining = np.ones(env.n_states, dtype=bool)
+    n_components = 0
+    trimmed_sources = []
+
+    while True:
+        inside = remaining[sources] & remaining[targets]
+        sources, targets = sources[inside], targets[inside]
+        sinks = remaining & (np.bincount(sources, minlength=env.n_states) == 0)
+        roots = remaining & ~sinks & (np.bincount(targets, minlength=env.n_states) == 0)
+        if not np.any(sinks | roots):
+            break
+
+        sinks = np.flatnonzero(sinks)
+        components[sinks] = n_components + np.arange(sinks.size)
+        n_components += sinks.size
+        trimmed_sources.append(np.flatnonzero(roots))
+        remaining[sinks] = False
+        remaining[roots] = False
+
+    edges = np.unique(sources.astype(np.int64) * env.n_states + targets)
+    indptr = np.zeros(env.n_states + 1, dtype=int)
+    np.cumsum(np.bincount(edges // env.n_states, minlength=env.n_states), out=indptr[1:])
+    indptr, adjacent = indptr.tolist(), (edges % env.n_states).tolist()
+
+    index = [-1] * env.n_states
+    lowlink = [0] * env.n_states
+    on_stack = [False] * env.n_states
+    stack = []
+    counter = 0
+
+    for root in np.flatnonzero(remaining).tolist():
+        if index[root] >= 0:
+            continue
+
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        path = [(root, indptr[root])]
+
+        while path:
+            v, i = path[-1]
+            end = indptr[v + 1]
+
+            while i < end:
+                w = adjacent[i]
+                i += 1
+
+                if index[w] < 0:
+                    path[-1] = (v, i)
+                    index[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    path.append((w, indptr[w]))
+                    break
+                elif on_stack[w]:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                path.pop()
+                if path:
+                    u = path[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+
+                if lowlink[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        components[w] = n_components
+                        if w == v:
+                            break
+                    n_components += 1
+
+    for roots in reversed(trimmed_sources):
+        components[roots] = n_components + np.arange(roots.size)
+        n_components += roots.size
+
+    return components
+
+
+def _policy_transition_matrix(env, policy):
+    """
+        Method to build the dense transition matrix of the Markov chain of a policy
+            P_π[s, s′] = p(s′|s, π(s))
+
+    :param env: Environment for which the transition matrix should be built
+    :param policy: Policy that chooses the actions
+    :return: transition matrix as a numpy array of shape n_states * n_states
+    """
+
+    states = np.arange(env.n_states)
+
+    if env.sparse:
+        successors, p, _ = env.get_sparse_prob_rewards()
+        p_pi = np.zeros((env.n_states, env.n_states), dtype=float_dtype())
+        np.add.at(p_pi, (states.reshape(-1, 1), successors[states, policy]), p[states, policy])
+        return p_pi
+
+    p, _ = env.get_prob_rewards()
+    return p[states, :, policy]
+
+
+def _bicgstab(matvec, b, x, tolerance, max_iterations):
+    """
+        Method to solve the linear system A x = b with the biconjugate gradient stabilized method (BiCGSTAB)
+        Only needs the product of A with a vector, so that A is never stored as a matrix
+        Restarts with the current residual as the shadow residual when the method breaks down
+        Raises RuntimeError if the maximum absolute residual is not below tolerance after max_iterations iterations
+
+    :param matvec: function that returns the product of A with a vector
+    :param b: Right hand side of the linear system
+    :param x: Initial guess of the solution
+    :param tolerance: Threshold of the maximum absolute residual that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :return: solution array
+    """
+
+    residual = b - matvec(x)
+    residual_hat = residual.copy()
+    direction = np.zeros_like(b)
+    v = np.zeros_like(b)
+    rho = alpha = omega = 1.
+
+    curr_iteration = 0
+
+    while curr_iteration < max_iterations and np.max(np.abs(residual)) >= tolerance:
+        rho, previous_rho = np.dot(residual_hat, residual), rho
+
+        if abs(rho) <= 1e-12 * np.dot(residual, residual) or omega == 0:
+            residual_hat = residual.copy()
+            direction = residual.copy()
+            rho = np.dot(residual, residual)
+        else:
+            direction = residual + (rho / previous_rho) * (alpha / omega) * (direction - omega * v)
+
+        v = matvec(direction)
+        alpha = rho / np.dot(residual_hat, v)
+
+        s = residual - alpha * v
+        x = x + alpha * direction
+        if np.max(np.abs(s)) < tolerance:
+            return x
+
+        t = matvec(s)
+        omega = np.dot(t, s) / np.dot(t, t)
+        x = x + omega * s
+        residual = s - omega * t
+
+        curr_iteration += 1
+
+    if np.max(np.abs(residual)) >= tolerance:
+        raise RuntimeError('BiCGSTAB did not converge in {} iterations'.format(max_iterations))
+
+    return x
+
+
+def policy_evaluation(env, policy, gamma, theta, max_iterations, synchronous=False, value=None, states=None):
     """
         Method to evaluate a policy and calculate the best value for that policy
+        The states are updated in place one at a time (Gauss-Seidel), or all at once from the values of the previous
+        iteration (Jacobi) if synchronous is True
+        To re-plan after a change of the environment, the evaluation can start from previous values and only update
+        the given states, while the values of the other states are kept
         Algorithm:
             1. initialisation:
-                - generate a flat value array with a size equal to number of states
+                - generate a flat value array with a size equal to number of states, or copy the initial values
                 - create an identity matrix to represent actions
                     [[1 0 0 0], -> Up
                      [0 1 0 0], -> Down
                      [0 0 1 0], -> Left
                      [0 0 0 1]] -> Right
-                - calculate probability & rewards only once for environment with PolicyRewardSingleton class
+                - get the probabilities and the expected rewards R(s, a) cached by the environment
+                  (dense or sparse, see _state_action_values())
             2. while stop condition or maximum number of iterations is not reached:
                 - initialise exact difference term 𝛿 (named delta in code) to use in stop condition later
-            3. for all states:
+            3. for all states (or the given states):
                 - get current state's current value from value array
                 - get the probability of actions with respect to current policy
                     e.g. if current policy includes action 'up' for a state
                     policy_action_prob = [1 0 0 0] (first row of identity matrix)
-                - calculate new value of current state under current policy
+                - calculate new value of current state under current policy from the action values of the state
                 - calculate new exact difference between current and new value of the state
+               if synchronous, instead calculate the new values of all states under current policy at once
+               (see _policy_values()) and the maximum exact difference between current and new values
             4. Get the values with respect to current policy computed in step 3
 
     :param env: Environment for which the policy should be evaluated
@@ -29,12 +386,22 @@ def policy_evaluation(env, policy, gamma, theta, max_iterations):
     :param gamma: Parameter to decay the future rewards, should be between 0 and 1.
     :param theta: Threshold that is used to identify when to stop the policy evaluation
     :param max_iterations: Maximum number of time-steps allowed for evaluating the policy
+    :param synchronous: If True, perform synchronous (Jacobi) instead of in place (Gauss-Seidel) updates (optional)
+    :param value: Initial value array, zeros if None (optional)
+    :param states: Array of the states to be updated, all the states if None (optional)
     :return: value array
     """
 
-    value = np.zeros(env.n_states, dtype=np.float)
-    identity = np.identity(env.n_actions)
-    p, r = env.get_prob_rewards()
+    value = np.zeros(env.n_states, dtype=float_dtype()) if value is None else np.array(value, dtype=float_dtype())
+    identity = np.identity(env.n_actions, dtype=float_dtype())
+
+    if synchronous and states is None:
+        policy_values = _policy_values(env, policy)
+    elif synchronous:
+        policy_values = _selected_action_values(env, states, policy[states])
+    else:
+        action_values = _state_action_values(env)
+        states = range(env.n_states) if states is None else states
 
     curr_iteration = 0
     stop = False
@@ -42,11 +409,20 @@ def policy_evaluation(env, policy, gamma, theta, max_iterations):
     while curr_iteration < max_iterations and not stop:
         delta = 0
 
-        for s in range(env.n_states):
-            current_value = value[s]
-            policy_action_prob = identity[policy[s]]
-            value[s] = np.sum(policy_action_prob * p[s] * (r[s] + (gamma * value.reshape(-1, 1))))
-            delta = max(delta, abs(current_value - value[s]))
+        if synchronous and states is None:
+            new_value = policy_values(value, gamma)
+            delta = np.max(np.abs(new_value - value))
+            value = new_value
+        elif synchronous:
+            new_value = policy_values(value, gamma)
+            delta = np.max(np.abs(new_value - value[states]), initial=0)
+            value[states] = new_value
+        else:
+            for s in states:
+                current_value = value[s]
+                policy_action_prob = identity[policy[s]]
+                value[s] = np.sum(policy_action_prob * action_values(s, value, gamma))
+                delta = max(delta, abs(current_value - value[s]))
 
         curr_iteration += 1
         stop = delta < theta
@@ -54,14 +430,53 @@ def policy_evaluation(env, policy, gamma, theta, max_iterations):
     return value
 
 
-def policy_improvement(env, policy, value, gamma):
+def exact_policy_evaluation(env, policy, gamma, theta, max_iterations=None, max_dense_states=256):
+    """
+        Method to evaluate a policy by solving the Bellman equations of the policy as a linear system
+            (I - γ P_π) V = R_π
+        Algorithm:
+            1. get the expected rewards R_π(s) = R(s, π(s)) of the action chosen by the policy in each state
+            2. if the number of states is at most max_dense_states:
+                - build the dense transition matrix P_π of the policy (see _policy_transition_matrix())
+                - solve the linear system directly
+            3. else:
+                - solve the linear system iteratively with BiCGSTAB, using the sparse matrix-vector product with P_π
+                  (see _policy_transitions()), until the maximum absolute residual is below theta * (1 - γ),
+                  which bounds the error of the values by theta
+        Raises RuntimeError if the iterative solver does not converge in max_iterations iterations, so that an
+        unconverged solution is never returned as the exact values
+
+    :param env: Environment for which the policy should be evaluated
+    :param policy: Policy that has to be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1 (excluded)
+    :param theta: Threshold of the error of the values that is used to stop the iterative solver
+    :param max_iterations: Maximum number of iterations allowed for the iterative solver, the number of states if
+                           None (optional)
+    :param max_dense_states: Maximum number of states for which the dense solver is used (optional)
+    :return: value array
+    """
+
+    expected_r = _policy_values(env, policy)(np.zeros(env.n_states, dtype=float_dtype()), 0.)
+
+    if env.n_states <= max_dense_states and env.representation != 'on_the_fly':
+        p_pi = _policy_transition_matrix(env, policy)
+        return np.linalg.solve(np.identity(env.n_states, dtype=float_dtype()) - (gamma * p_pi), expected_r)
+
+    max_iterations = env.n_states if max_iterations is None else max_iterations
+
+    transitions = _policy_transitions(env, policy)
+    return _bicgstab(lambda value: value - (gamma * transitions(value)), expected_r,
+                     np.zeros(env.n_states, dtype=float_dtype()), theta * (1 - gamma), max_iterations)
+
+
+def policy_improvement(env, policy, value, gamma, states=None):
     """
         Method to improve the policy based on the value provided
         Algorithm:
             1. Initialisation:
-                - Generate improved policy array with a size equal to number of states
-                - Calculate probability & rewards only once for environment with PolicyRewardSingleton class
-            2. For all states:
+                - Get the probabilities and the expected rewards R(s, a) cached by the environment
+            2. For all states (or the given states, the actions of the other states are kept) at once:
+                - Calculate the values of all actions with a single tensor contraction (see _action_values())
                 - Assign the action with maximum value to improved policy array
             3. Get improved policy and stop condition
                 - If policy and improved_policy are exact same stop condition will be True
@@ -70,89 +485,191 @@ def policy_improvement(env, policy, value, gamma):
     :param policy: Policy that has to be evaluated
     :param value: Value array used to improve the policy
     :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param states: Array of the states to be improved, all the states if None (optional)
     :return: policy array
     """
 
-    improved_policy = np.zeros(env.n_states, dtype=int)
-    p, r = env.get_prob_rewards()
-
-    for s in range(env.n_states):
-        improved_policy[s] = np.argmax(np.sum(p[s] * (r[s] + (gamma * value.reshape(-1, 1))), axis=0))
+    if states is None:
+        action_values = _action_values(env)
+        improved_policy = np.argmax(action_values(value, gamma), axis=1).astype(policy_dtype(env.n_actions))
+    else:
+        action_values = _state_action_values(env)
+        improved_policy = np.array(policy)
+        improved_policy[states] = np.argmax(action_values(states, value, gamma), axis=1)
 
     return improved_policy, np.all(np.equal(policy, improved_policy))
 
 
-def policy_iteration(env, gamma, theta, max_iterations):
+def policy_iteration(env, gamma, theta, max_iterations, synchronous=False, exact=False, policy=None, value=None,
+                     states=None):
     """
         Method to perform policy iteration until convergence
         It evaluates a policy, improves it in a loop until convergence
+        To re-plan after a change of the environment, it can start from a previous policy and only evaluate and
+        improve the given states, while the values of the other states are kept (see replan_policy_iteration())
         Algorithm:
             1. initialisation:
-                - generate policy array with a size equal to number of states
-                - generate value array with a size equal to number of states
+                - generate policy array with a size equal to number of states, or copy the initial policy
+                - generate value array with a size equal to number of states, or copy the initial values, so that
+                  re-planning is warm started from the values found before the change
             2. while stop condition or maximum number of iterations is not reached:
-                - call policy evaluation function to evaluate current policy
+                - call policy evaluation function to evaluate current policy (only the given states), starting from
+                  the values of the previous policy, or exact policy evaluation function of all the states if exact
+                  is True, whose solver has its own limit of iterations (see exact_policy_evaluation())
                 - call policy improvement function to improve current policy
             3. Get the best policy and values for that policy
 
     :param env: Environment for which the policy should be evaluated
     :param gamma: Parameter to decay the future rewards, should be between 0 and 1
     :param theta: Threshold that is used to identify when to stop the policy evaluation
-    :param max_iterations: Maximum number of time-steps allowed for evaluating the policy
+    :param max_iterations: Maximum number of time-steps allowed for evaluating the policy, and maximum number of
+                           iterations of policy iteration
+    :param synchronous: If True, evaluate the policies with synchronous (Jacobi) updates (optional)
+    :param exact: If True, evaluate the policies by solving their Bellman equations as a linear system (optional)
+    :param policy: Initial policy array, zeros if None (optional)
+    :param value: Initial value array, zeros if None, the values of the states that are not evaluated are kept
+                  when states is given (optional)
+    :param states: Array of the states to be evaluated and improved, all the states if None (optional)
     :return: Policy and Value arrays as a tuple
     """
 
-    policy = np.zeros(env.n_states, dtype=int)
-    value = np.zeros(env.n_states, dtype=np.float)
+    policy = np.zeros(env.n_states, dtype=policy_dtype(env.n_actions)) if policy is None else \
+        np.array(policy, dtype=policy_dtype(env.n_actions))
+    value = np.zeros(env.n_states, dtype=float_dtype()) if value is None else np.array(value, dtype=float_dtype())
 
     stop = False
     current_iteration = 0
 
     while current_iteration < max_iterations and not stop:
-        value = policy_evaluation(env, policy, gamma, theta, max_iterations)
-        policy, stop = policy_improvement(env, policy, value, gamma)
+        if exact:
+            value = exact_policy_evaluation(env, policy, gamma, theta)
+        else:
+            value = policy_evaluation(env, policy, gamma, theta, max_iterations, synchronous, value, states)
+        policy, stop = policy_improvement(env, policy, value, gamma, states)
         current_iteration += 1
 
     return policy, value
 
 
-def value_iteration(env, gamma, theta, max_iterations):
+def modified_policy_iteration(env, gamma, theta, max_iterations, k):
+    """
+        Method to perform modified policy iteration until convergence
+        It improves the policy and partially evaluates it with at most k synchronous sweeps in a loop until
+        convergence. The evaluation of each policy is warm started from the values of the previous one, as
+        consecutive policies differ in only a few states. k = 0 is value iteration, a large k is policy iteration
+        Algorithm:
+            1. initialisation:
+                - generate value array with a size equal to number of states
+            2. while stop condition or maximum number of iterations is not reached:
+                - calculate the values for all actions of all states at once (see _action_values())
+                - improve the policy with the actions with maximum value, and assign the maximum values to the values
+                - stop if the maximum exact difference between current and new values is less than theta
+                - else, evaluate the improved policy with at most k synchronous sweeps starting from the new values,
+                  stopping early if the maximum exact difference of a sweep is less than theta
+            3. Get the best policy and values, with the number of iterations and evaluation sweeps used
+
+    :param env: Environment for which the policy should be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop the policy iteration and evaluation
+    :param max_iterations: Maximum number of policy improvements
+    :param k: Maximum number of evaluation sweeps for each policy
+    :return: Policy and Value arrays, number of iterations and number of evaluation sweeps as a tuple
+    """
+
+    value = np.zeros(env.n_states, dtype=float_dtype())
+    states = np.arange(env.n_states)
+    action_values = _action_values(env)
+
+    curr_iteration = 0
+    sweeps = 0
+    stop = False
+
+    while curr_iteration < max_iterations and not stop:
+        q = action_values(value, gamma)
+        policy = np.argmax(q, axis=1).astype(policy_dtype(env.n_actions))
+
+        new_value = q[states, policy]
+        stop = np.max(np.abs(new_value - value)) < theta
+        value = new_value
+
+        if not stop:
+            policy_values = _policy_values(env, policy)
+
+            for _ in range(k):
+                new_value = policy_values(value, gamma)
+                delta = np.max(np.abs(new_value - value))
+                value = new_value
+                sweeps += 1
+
+                if delta < theta:
+                    break
+
+        curr_iteration += 1
+
+    return policy, value, curr_iteration, sweeps
+
+
+def value_iteration(env, gamma, theta, max_iterations, synchronous=False, value=None, states=None):
     """
         Method to perform value iteration until convergence
         It finds the best value for the environment, creates an optimal policy based on best value found
+        The states are updated in place one at a time (Gauss-Seidel), or all at once from the values of the previous
+        iteration (Jacobi) if synchronous is True
+        To re-plan after a change of the environment, it can start from previous values and only update the given
+        states, while the values of the other states are kept (see replan_value_iteration())
         Algorithm:
             1. initialisation:
                 - generate policy array with a size equal to number of states
-                - generate value array with a size equal to number of states
-                - calculate probability & rewards only once for environment with PolicyRewardSingleton class
+                - generate value array with a size equal to number of states, or copy the initial values
+                - get the probabilities and the expected rewards R(s, a) cached by the environment
+                  (dense or sparse, see _state_action_values())
             2. while stop condition or maximum number of iterations is not reached:
                 - initialise exact difference term 𝛿 (named delta in code) to use in stop condition later
-            3. for all states:
+            3. for all states (or the given states):
                 - get current state's current value from value array
                 - calculate new values for all actions at once and get the maximum value for all states
                 - calculate new exact difference between current and new value of the state
+               if synchronous, instead calculate the new values for all actions of all states at once with a single
+               tensor contraction (see _action_values()) and the maximum exact difference between current and new values
             4. Get the best policy with respect to calculated values
 
     :param env: Environment for which the policy should be evaluated
     :param gamma: Parameter to decay the future rewards, should be between 0 and 1
     :param theta: Threshold that is used to identify when to stop the policy evaluation
     :param max_iterations: Maximum number of time-steps allowed for evaluating the policy
+    :param synchronous: If True, perform synchronous (Jacobi) instead of in place (Gauss-Seidel) updates (optional)
+    :param value: Initial value array, zeros if None (optional)
+    :param states: Array of the states to be updated, all the states if None (optional)
     :return: Policy and Value arrays as a tuple
     """
-    policy = np.zeros(env.n_states, dtype=int)
-    value = np.zeros(env.n_states, dtype=np.float)
+    policy = np.zeros(env.n_states, dtype=policy_dtype(env.n_actions))
+    value = np.zeros(env.n_states, dtype=float_dtype()) if value is None else np.array(value, dtype=float_dtype())
 
     curr_iteration = 0
     stop = False
-    p, r = env.get_prob_rewards()
+
+    if synchronous and states is None:
+        action_values = _action_values(env)
+    else:
+        action_values = _state_action_values(env)
+        states = range(env.n_states) if states is None else states
 
     while curr_iteration < max_iterations and not stop:
         delta = 0
 
-        for s in range(env.n_states):
-            current_value = value[s]
-            value[s] = np.max(np.sum(p[s] * (r[s] + (gamma * value.reshape(-1, 1))), axis=0))
-            delta = max(delta, abs(current_value - value[s]))
+        if synchronous and states is None:
+            new_value = np.max(action_values(value, gamma), axis=1)
+            delta = np.max(np.abs(new_value - value))
+            value = new_value
+        elif synchronous:
+            new_value = np.max(action_values(states, value, gamma), axis=1)
+            delta = np.max(np.abs(new_value - value[states]), initial=0)
+            value[states] = new_value
+        else:
+            for s in states:
+                current_value = value[s]
+                value[s] = np.max(action_values(s, value, gamma))
+                delta = max(delta, abs(current_value - value[s]))
 
         curr_iteration += 1
         stop = delta < theta
@@ -160,3 +677,401 @@ def value_iteration(env, gamma, theta, max_iterations):
     policy, _ = policy_improvement(env, policy, value, gamma)
 
     return policy, value
+
+
+def topological_value_iteration(env, gamma, theta, max_iterations):
+    """
+        Method to perform value iteration on the strongly connected components of the transition graph in reverse
+        topological order
+        The value of a state only depends on the states it can reach, so when the components are solved in reverse
+        topological order, the values of the states reached from a component are final before it is solved, and
+        the values propagate in one ordered pass instead of many sweeps over all the states.
+        Components with the same depth in the graph of the components do not reach each other, and are solved at once
+        It only pays off on maze-like or acyclic maps, with many small components: an open lake is mostly one large
+        component, which is solved by the same sweeps as value iteration after the cost of finding the components
+        Algorithm:
+            1. initialisation:
+                - generate value array with a size equal to number of states
+                - decompose the transition graph into strongly connected components
+                  (see _strongly_connected_components())
+                - calculate the depth of every component, i.e, the length of the longest path to a component that
+                  does not reach any other component, in one pass over the components in reverse topological order,
+                  as the depths of the components a component reaches are known before it
+            2. for each depth in increasing order:
+                - select the probabilities and expected rewards of the states of the components with that depth once
+                  (see _selected_action_values())
+                - if all these components are single states without a transition to themselves, their values are
+                  final after one update of the maximum value of their actions
+                - else, while stop condition or maximum number of iterations is not reached:
+                    - calculate new values for all actions of the states at once and get the maximum value
+                    - calculate the maximum exact difference between current and new values of the states,
+                      stop when it is less than theta
+            3. Get the best policy with respect to calculated values
+
+    :param env: Environment for which the policy should be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop the iterations of a depth
+    :param max_iterations: Maximum number of iterations of a depth
+    :return: Policy and Value arrays as a tuple
+    """
+
+    policy = np.zeros(env.n_states, dtype=policy_dtype(env.n_actions))
+    value = np.zeros(env.n_states, dtype=float_dtype())
+
+    successors, p, _ = env.get_sparse_prob_rewards()
+    components = _strongly_connected_components(env)
+
+    states = np.broadcast_to(np.arange(env.n_states).reshape(-1, 1, 1), successors.shape)[p > 0]
+    sources, targets = components[states], components[successors[p > 0]]
+    n_components = components.max() + 1
+    cyclic = np.zeros(n_components, dtype=bool)
+    cyclic[sources[sources == targets]] = True
+    cyclic |= np.bincount(components) > 1
+    sources, targets = sources[sources != targets], targets[sources != targets]
+
+    edges = np.unique(sources.astype(np.int64) * n_components + targets)
+    indptr = np.searchsorted(edges // n_components, np.arange(n_components + 1)).tolist()
+    targets = (edges % n_components).tolist()
+
+    depth = [0] * n_components
+    for c in range(n_components):
+        for i in range(indptr[c], indptr[c + 1]):
+            depth[c] = max(depth[c], depth[targets[i]] + 1)
+    depth = np.array(depth)
+
+    state_depth = depth[components]
+    order = np.argsort(state_depth, kind='stable')
+    levels = np.split(order, np.flatnonzero(np.diff(state_depth[order])) + 1)
+
+    for level in levels:
+        level_actions = np.repeat(level, env.n_actions), np.tile(np.arange(env.n_actions), level.size)
+        action_values = _selected_action_values(env, *level_actions)
+        max_level_iterations = max_iterations if np.any(cyclic[components[level]]) else 1
+
+        curr_iteration = 0
+        stop = False
+
+        while curr_iteration < max_level_iterations and not stop:
+            new_value = np.max(action_values(value, gamma).reshape(-1, env.n_actions), axis=1)
+            delta = np.max(np.abs(new_value - value[level]))
+            value[level] = new_value
+
+            curr_iteration += 1
+            stop = delta < theta
+
+    policy, _ = policy_improvement(env, policy, value, gamma)
+
+    return policy, value
+
+
+def multigrid_value_iteration(env, gamma, theta, max_iterations, block_size=4, min_size=16):
+    """
+        Method to perform value iteration on a FrozenLake from coarse to fine resolutions of the lake
+        A step on a coarse lake crosses a block of block_size tiles, so the rewards propagate over long distances in
+        few cheap sweeps of the coarse lake, and its values are used as initial values of the next finer lake, so that
+        the value iteration of the finer lake only has to refine them
+        Algorithm:
+            1. initialisation:
+                - coarsen the lake into blocks of block_size * block_size tiles (see coarsen_lake()), and the coarse
+                  lake again, until the coarse lake has less than min_size * block_size rows or columns
+            2. for each lake from the coarsest to the lake of env:
+                - create a sparse FrozenLake of the lake with the slip of env, except for the lake of env
+                - decay the future rewards of a lake coarsened l times with gamma^(block_size^l), as a step on it
+                  corresponds to block_size^l steps on the lake of env
+                - perform synchronous value iteration, starting from the values of the coarser lake projected to the
+                  tiles of the lake (every tile gets the value of its block, see block_indices()), or zeros for the
+                  coarsest lake
+            3. Get the best policy with respect to the values of env
+
+    :param env: FrozenLake for which the policy should be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop the value iteration of each lake
+    :param max_iterations: Maximum number of iterations of each lake
+    :param block_size: Number of rows and columns of the tiles coarsened into a block (optional)
+    :param min_size: Minimum number of rows and columns of the coarsest lake (optional)
+    :return: Policy and Value arrays as a tuple
+    """
+
+    lakes = [env.lake]
+    while min(np.shape(lakes[-1])) >= min_size * block_size:
+        lakes.append(coarsen_lake(lakes[-1], block_size))
+
+    value = None
+
+    for level in range(len(lakes) - 1, -1, -1):
+        level_env = env if level == 0 else FrozenLake(lakes[level], env.slip, env.max_steps, sparse=True)
+
+        if value is not None:
+            value = value[block_indices(*np.shape(lakes[level]), block_size)]
+
+        policy, value = value_iteration(level_env, gamma ** (block_size ** level), theta, max_iterations,
+                                        synchronous=True, value=value)
+
+    return policy, value
+
+
+def affected_states(env, changed_states):
+    """
+        Method to find the states whose values can change when the transitions or rewards of changed_states change,
+        e.g. the states returned by FrozenLake.set_tiles()
+        The value of a state only depends on the states it can reach, so these are the states from which any of the
+        changed states is reached with a probability greater than 0 (see _states_reaching())
+
+    :param env: Environment in which the states changed
+    :param changed_states: Array of the states whose transitions or rewards changed
+    :return: Array of the affected states
+    """
+
+    return np.flatnonzero(_states_reaching(env, changed_states))
+
+
+def replan_value_iteration(env, changed_states, value, gamma, theta, max_iterations, synchronous=True):
+    """
+        Method to perform value iteration after the transitions or rewards of some states changed
+        Starts from the values found before the change and only updates the affected states
+        (see affected_states()), the values of the other states are unchanged by construction
+
+    :param env: Environment in which the states changed
+    :param changed_states: Array of the states whose transitions or rewards changed
+    :param value: Value array found before the change
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param synchronous: If True, perform synchronous (Jacobi) instead of in place (Gauss-Seidel) updates (optional)
+    :return: Policy and Value arrays as a tuple
+    """
+
+    states = affected_states(env, changed_states)
+    return value_iteration(env, gamma, theta, max_iterations, synchronous, value, states)
+
+
+def replan_policy_iteration(env, changed_states, policy, value, gamma, theta, max_iterations, synchronous=True):
+    """
+        Method to perform policy iteration after the transitions or rewards of some states changed
+        Starts from the policy and values found before the change and only evaluates and improves the affected
+        states (see affected_states()), the policy and values of the other states are unchanged by construction
+
+    :param env: Environment in which the states changed
+    :param changed_states: Array of the states whose transitions or rewards changed
+    :param policy: Policy array found before the change
+    :param value: Value array found before the change
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop the policy evaluation
+    :param max_iterations: Maximum number of time-steps allowed for evaluating the policy
+    :param synchronous: If True, evaluate the policies with synchronous (Jacobi) updates (optional)
+    :return: Policy and Value arrays as a tuple
+    """
+
+    states = affected_states(env, changed_states)
+    return policy_iteration(env, gamma, theta, max_iterations, synchronous, policy=policy, value=value, states=states)
+
+
+def prioritized_sweeping(env, gamma, theta, max_iterations):
+    """
+        Method to perform asynchronous value iteration with prioritized sweeping until convergence
+        Instead of sweeping all the states, it only backs up the states whose successors changed, in the order of
+        their Bellman error, so that far fewer backups are needed when most states keep their value
+        Algorithm:
+            1. initialisation:
+                - generate value array with a size equal to number of states
+                - get the predecessor index of the states (see EnvironmentModel.get_predecessors())
+                - calculate the Bellman error |max_a Q(s, a) - V(s)| of all states at once, and push the states
+                  with an error of at least theta into a priority queue with the largest error first
+            2. while the priority queue is not empty and maximum number of backups is not reached:
+                - pop the state with the largest Bellman error, skipping entries whose error is outdated
+                - back up the state, V(s) ← max_a Q(s, a)
+                - calculate the Bellman error of the predecessors of the state at once, and push the predecessors
+                  with an error of at least theta into the priority queue
+            3. Get the best policy with respect to calculated values, when the queue is empty all the Bellman
+               errors are less than theta, the same stop condition as a sweep of value iteration
+
+    :param env: Environment for which the policy should be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of backups allowed, as a number of sweeps of all the states
+    :return: Policy and Value arrays and number of backups as a tuple
+    """
+
+    value = np.zeros(env.n_states, dtype=float_dtype())
+    indptr, predecessors = env.get_predecessors()
+    action_values = _state_action_values(env)
+
+    priority = np.abs(np.max(_action_values(env)(value, gamma), axis=1) - value)
+    priority[priority < theta] = 0
+    queue = [(-priority[s], s) for s in np.flatnonzero(priority)]
+    heapq.heapify(queue)
+
+    backups = 0
+
+    while queue and backups < max_iterations * env.n_states:
+        error, s = heapq.heappop(queue)
+        if -error != priority[s]:
+            continue
+
+        priority[s] = 0
+        value[s] = np.max(action_values(s, value, gamma))
+        backups += 1
+
+        states = predecessors[indptr[s]:indptr[s + 1]]
+        errors = np.abs(np.max(action_values(states, value, gamma), axis=1) - value[states])
+
+        for state, error in zip(states, errors):
+            if error >= theta and error != priority[state]:
+                priority[state] = error
+                heapq.heappush(queue, (-error, state))
+
+    policy, _ = policy_improvement(env, np.zeros(env.n_states, dtype=policy_dtype(env.n_actions)), value, gamma)
+
+    return policy, value, backups
+
+
+def action_elimination_value_iteration(env, gamma, theta, max_iterations):
+    """
+        Method to perform synchronous value iteration with action elimination until convergence
+        For V′ = T V, the span seminorm sp(V′ - V) = max(V′ - V) - min(V′ - V) bounds the optimal values
+            V′ + γ / (1 - γ) min(V′ - V) ≤ V* ≤ V′ + γ / (1 - γ) max(V′ - V)
+        so an action a can't be optimal in state s if V′(s) - Q(s, a) > γ / (1 - γ) sp(V′ - V). Such actions are
+        eliminated permanently and their values are not calculated anymore. When the rewards are not negative and
+        the values start from 0, the span is the maximum exact difference used by value_iteration
+        Algorithm:
+            1. initialisation:
+                - generate value array with a size equal to number of states
+                - keep only the first of the actions of a state that have the exact same successors, probabilities
+                  and rewards, as they always have the same value
+                - keep only the first action of the states that can't reach any state with a reward
+                  (see _states_reaching()), as all their actions always have the value 0
+            2. while stop condition or maximum number of iterations is not reached:
+                - calculate the values of the remaining actions of all states at once
+                  (see _selected_action_values()) and get the maximum value for all states
+                - if the span of the difference between current and new values is less than theta, stop
+                - eliminate the actions that can't be optimal, the values of the pairs of states and actions to
+                  calculate are selected again once a quarter of them are eliminated
+                - if a single action remains in every state, the greedy policy is provably fixed, stop and evaluate
+                  it exactly to within theta (see exact_policy_evaluation(), its solver is not limited by
+                  max_iterations)
+            3. Get the best policy among the remaining actions with respect to calculated values
+
+    :param env: Environment for which the policy should be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1 (excluded)
+    :param theta: Threshold of the span that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :return: Policy and Value arrays as a tuple
+    """
+
+    value = np.zeros(env.n_states, dtype=float_dtype())
+
+    successors, p, r = env.get_sparse_prob_rewards()
+    same = np.all((successors[:, :, np.newaxis] == successors[:, np.newaxis]) & (p[:, :, np.newaxis] == p[:, np.newaxis]) &
+                  (r[:, :, np.newaxis] == r[:, np.newaxis]), axis=3)
+    active = ~np.any(np.tril(same, k=-1), axis=2)
+
+    rewarding = np.flatnonzero(np.any(env.get_expected_rewards() != 0, axis=1))
+    active[~_states_reaching(env, rewarding), 1:] = False
+
+    states, actions = np.nonzero(active)
+    action_values = _selected_action_values(env, states, actions)
+    q = np.full((env.n_states, env.n_actions), -np.inf, dtype=float_dtype())
+
+    curr_iteration = 0
+
+    while curr_iteration < max_iterations:
+        q[states, actions] = action_values(value, gamma)
+        q[~active] = -np.inf
+        new_value = np.max(q, axis=1)
+
+        difference = new_value - value
+        span = np.max(difference) - np.min(difference)
+        value = new_value
+        curr_iteration += 1
+
+        if span < theta:
+            break
+
+        eliminated = active & (new_value.reshape(-1, 1) - q > gamma / (1 - gamma) * span)
+        if np.any(eliminated):
+            active &= ~eliminated
+
+            if np.all(np.sum(active, axis=1) == 1):
+                policy = np.argmax(active, axis=1).astype(policy_dtype(env.n_actions))
+                return policy, exact_policy_evaluation(env, policy, gamma, theta)
+
+            if np.sum(active) <= 0.75 * len(states):
+                states, actions = np.nonzero(active)
+                action_values = _selected_action_values(env, states, actions)
+
+    return np.argmax(q, axis=1).astype(policy_dtype(env.n_actions)), value
+
+
+def batched_value_iteration(envs, gammas, theta, max_iterations):
+    """
+        Method to perform synchronous value iteration for every pair of a model and a discount factor at once
+        e.g. to sweep the slip of FrozenLake and gamma, the models are the environments created with each slip.
+        The models must have the same number of states and actions, the pairs are stacked along the last axis of the
+        value array, so that a sweep of all the pairs is a single set of tensor operations and the values of the
+        successors of a state are gathered for all the pairs at once.
+        Algorithm:
+            1. initialisation:
+                - merge the sparse successor tables of the models (see Environment.get_sparse_prob_rewards()),
+                  the tables are shared if they are equal (e.g. FrozenLake with different slips), else they are
+                  concatenated and the probabilities of a model are 0 for the successors of the other models
+                - stack the probabilities and expected rewards of the models for every pair
+                - generate value array of size number of states * number of pairs
+                - the pairs that have not converged form the batch, its tables shrink when pairs converge
+            2. while there are pairs that have not converged or maximum number of iterations is not reached:
+                - calculate new values for all actions of all states of the batch at once and get the maximum value
+                - calculate the maximum exact difference between current and new values of each pair,
+                  a pair has converged and is dropped from the batch when it is less than theta
+            3. Get the best policies with respect to calculated values
+
+    :param envs: List of environments with the models to be solved
+    :param gammas: Array of the parameters to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :return: Policy and Value arrays of shape number of models * number of gammas * number of states as a tuple
+    """
+
+    gammas = np.asarray(gammas, dtype=float_dtype())
+    n_models, n_gammas, n_states = len(envs), len(gammas), envs[0].n_states
+
+    tables = [env.get_sparse_prob_rewards()[:2] for env in envs]
+    if all(np.array_equal(tables[0][0], successors) for successors, _ in tables):
+        successors, p = tables[0][0], np.stack([p for _, p in tables], axis=-1)
+    else:
+        successors = np.concatenate([successors for successors, _ in tables], axis=2)
+        p = np.zeros(successors.shape + (n_models,), dtype=float_dtype())
+        for m, (model_successors, model_p) in enumerate(tables):
+            width = model_successors.shape[2]
+            p[:, :, m * width:(m + 1) * width, m] = model_p
+
+    pairs = np.arange(n_models * n_gammas)
+    models = pairs // n_gammas
+
+    p = p[..., models]
+    expected_r = np.stack([env.get_expected_rewards() for env in envs], axis=-1)[..., models]
+    gammas = gammas[pairs % n_gammas]
+
+    value = np.zeros((n_states, pairs.size), dtype=float_dtype())
+
+    def _batch_action_values(value, p, expected_r, gammas):
+        return expected_r + (gammas * np.sum(p * value[successors], axis=2))
+
+    batch = (value, p, expected_r, gammas)
+    curr_iteration = 0
+
+    while curr_iteration < max_iterations and pairs.size > 0:
+        new_value = np.max(_batch_action_values(*batch), axis=1)
+        delta = np.max(np.abs(new_value - batch[0]), axis=0)
+        batch = (new_value,) + batch[1:]
+
+        curr_iteration += 1
+
+        converged = delta < theta
+        if np.any(converged) or curr_iteration == max_iterations:
+            value[:, pairs] = new_value
+            pairs = pairs[~converged]
+            batch = tuple(array[..., ~converged] for array in batch)
+
+    policy = np.argmax(_batch_action_values(value, p, expected_r, gammas), axis=1)
+    policy = policy.astype(policy_dtype(envs[0].n_actions))
+
+    return policy.T.reshape(n_models, n_gammas, n_states), value.T.reshape(n_models, n_gammas, n_states)
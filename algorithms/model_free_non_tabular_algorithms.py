@@ -1,6 +1,9 @@
 import numpy as np
 
+from algorithms.eligibility_traces import SparseTraces
 from algorithms.epsilon_greedy import EpsilonGreedySelection
+from algorithms.replay_buffer import ReplayBuffer
+from env.precision import float_dtype
 
 
 def linear_sarsa(env, max_episodes, eta, gamma, epsilon, seed=None):
@@ -41,7 +44,7 @@ def linear_sarsa(env, max_episodes, eta, gamma, epsilon, seed=None):
     random_state = np.random.RandomState(seed)
     eta = np.linspace(eta, 0, max_episodes)
     epsilon = np.linspace(epsilon, 0, max_episodes)
-    theta = np.zeros(env.n_features)
+    theta = np.zeros(env.n_features, dtype=float_dtype())
 
     for i in range(max_episodes):
         features = env.reset()
@@ -102,7 +105,7 @@ def linear_q_learning(env, max_episodes, eta, gamma, epsilon, seed=None):
     random_state = np.random.RandomState(seed)
     eta = np.linspace(eta, 0, max_episodes)
     epsilon = np.linspace(epsilon, 0, max_episodes)
-    theta = np.zeros(env.n_features)
+    theta = np.zeros(env.n_features, dtype=float_dtype())
 
     for i in range(max_episodes):
         features = env.reset()
@@ -120,3 +123,216 @@ def linear_q_learning(env, max_episodes, eta, gamma, epsilon, seed=None):
             features = features_prime
 
     return theta
+
+
+def linear_replay_q_learning(env, max_episodes, eta, gamma, epsilon, capacity=10000, batch_size=32, seed=None):
+    """
+        Method to implement linear approximation with Q-learning control and experience replay
+        Algorithm:
+            1. initialization:
+                - generate a random state for the game
+                - create evenly spaced learning rates (eta), exploration factor (epsilon) over maximum episodes
+                - weight/theta initialized to zeroes of size of feature vector
+                - replay buffer of capacity transitions (see ReplayBuffer), the states of the wrapped environment are
+                  stored instead of their features
+            2. for each episode:
+                - initialise the state for the episode i
+                - linearly combine the features (action value pair of action and states) with weight/theta
+                    Q(a) ← Σi θi φ(s, a)i
+                - execute step 3 till the end of game
+            3. while the terminal state is not reached:
+                - select an action from the random state with the epsilon-greedy policy
+                - get the reward(r), game state(done) and features of the next state for the selected action in the
+                  current state
+                - store the transition in the replay buffer, it is terminal if the next state is the absorbing state
+                - once the buffer holds batch_size transitions, sample a minibatch of transitions, encode their states
+                  at once (see LinearWrapper.encode_states()) and calculate their temporal differences
+                    δ ← r + γ max a′ Q(s′, a′) − Q(s, a)
+                  with the value of the next state only for the non terminal transitions, and update the weights
+                  with the updates of the transitions averaged over the transitions whose features are not zero
+                    θ ← θ + α Σ δφ(s, a) / Σ [φ(s, a) ≠ 0]
+                - linearly combine the features of the next state with weight/theta
+
+    :param env:          LinearWrapper of an environment of the game with an absorbing state, e.g. FrozenLake
+    :param max_episodes: Maximum number of episodes
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param capacity:     Maximum number of transitions stored in the replay buffer (optional)
+    :param batch_size:   Number of transitions of the minibatch of each update (optional)
+    :param seed:         Pseudorandom number generator
+    :return:             Weights - the learnable parameter
+    """
+
+    random_state = np.random.RandomState(seed)
+    eta = np.linspace(eta, 0, max_episodes)
+    epsilon = np.linspace(epsilon, 0, max_episodes)
+    theta = np.zeros(env.n_features, dtype=float_dtype())
+    buffer = ReplayBuffer(capacity, env.n_states, env.n_actions, random_state)
+
+    for i in range(max_episodes):
+        features = env.reset()
+        s = env.env.state
+        e_selection = EpsilonGreedySelection(epsilon[i], random_state)
+        q = np.dot(features, theta)
+        done = False
+
+        while not done:
+            a = e_selection.select(q)
+            features_prime, r, done = env.step(a)
+            s_prime = env.env.state
+            buffer.store(s, a, r, s_prime, s_prime == env.env.absorbing_state)
+
+            if len(buffer) >= batch_size:
+                states, actions, rewards, next_states, terminal = buffer.sample(batch_size)
+                features_batch = env.encode_states(states)[np.arange(batch_size), actions]
+                q_next = np.dot(env.encode_states(next_states), theta)
+                delta = rewards + (gamma * np.where(terminal, 0, np.max(q_next, axis=1))) - \
+                    np.dot(features_batch, theta)
+                theta += eta[i] * np.dot(delta, features_batch) / np.maximum(np.sum(features_batch != 0, axis=0), 1)
+
+            q = np.dot(features_prime, theta)
+            s = s_prime
+
+    return theta
+
+
+def linear_sarsa_lambda(env, max_episodes, eta, gamma, epsilon, lambda_, trace_cutoff=0.01, seed=None):
+    """
+        Method to implement linear approximation with SARSA(λ) control and replacing eligibility traces
+        Algorithm:
+            1. initialization:
+                - generate a random state for the game
+                - create evenly spaced learning rates (eta), exploration factor (epsilon) over maximum episodes
+                - weight/theta initialized to zeroes of size of feature vector
+                - sparse traces of the weights that decay by γλ per step (see SparseTraces)
+            2. for each episode:
+                - clear the traces and create the q from a dot product of features and theta
+                - select an action from the random state with the epsilon-greedy policy
+                - execute step 3 till the end of game
+            3. while the terminal state is not reached:
+                - get the reward(r), game state(done) and features of the next state (φ(s', a')) for the selected
+                  action in the current state
+                - calculate a part of the temporal difference, δ ← r − Q(a)
+                - linearly combine the next features (action value of next pair of action and states) with weight/theta
+                    Q(a′) ← Σi θi φ(s′, a′)i
+                - select next action from the current state with the epsilon-greedy policy
+                - calculate the temporal difference:
+                    δ ← δ + γ * Q(a′)
+                - set the traces of the non zero features of the current state and action to the features, and
+                  update the weights of all the recently active features with their traces, which then decay
+                  (dropped below trace_cutoff):
+                    θ ← θ + αδe
+                    e ← γλe
+                - re-assign the next set of features and action to the current state and features for the next iteration
+                    φ(s, a) ← φ(s', a')
+
+    :param env:          Environment of the game
+    :param max_episodes: Maximum number of episodes
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param lambda_:      Trace decay (λ), 0 is linear_sarsa
+    :param trace_cutoff: Traces below trace_cutoff are dropped (optional)
+    :param seed:         Pseudorandom number generator
+    :return:             Weights - the learnable parameter
+    """
+
+    random_state = np.random.RandomState(seed)
+    eta = np.linspace(eta, 0, max_episodes)
+    epsilon = np.linspace(epsilon, 0, max_episodes)
+    theta = np.zeros(env.n_features, dtype=float_dtype())
+    traces = SparseTraces(gamma * lambda_, trace_cutoff)
+
+    for i in range(max_episodes):
+        features = env.reset()
+        traces.clear()
+        q = np.dot(features, theta)
+        e_selection = EpsilonGreedySelection(epsilon[i], random_state)
+        a = e_selection.select(q)
+        done = False
+
+        while not done:
+            features_prime, r, done = env.step(a)
+            delta = r - q[a]
+            q = np.dot(features_prime, theta)
+            a_prime = e_selection.select(q)
+            delta += gamma * q[a_prime]
+            active = np.flatnonzero(features[a])
+            traces.replace(active, features[a, active])
+            traces.update(theta, eta[i] * delta)
+            features = features_prime
+            a = a_prime
+
+    return theta
+
+
+def linear_q_lambda(env, max_episodes, eta, gamma, epsilon, lambda_, trace_cutoff=0.01, seed=None):
+    """
+        Method to implement linear approximation with Watkins's Q(λ) control and replacing eligibility traces
+        Algorithm:
+            1. initialization:
+                - generate a random state for the game
+                - create evenly spaced learning rates (eta), exploration factor (epsilon) over maximum episodes
+                - weight/theta initialized to zeroes of size of feature vector
+                - sparse traces of the weights that decay by γλ per step (see SparseTraces)
+            2. for each episode:
+                - clear the traces and create the q from a dot product of features and theta
+                    Q(a) ← Σi θi φ(s, a)i
+                - execute step 3 till the end of game
+            3. while the terminal state is not reached:
+                - select an action from the random state with the epsilon-greedy policy, and clear the traces if it
+                  is an exploratory action
+                - get the reward(r), game state(done) and features of the next state (φ(s', a')) for the selected
+                  action in the current state
+                - calculate a part of the temporal difference, δ ← r − Q(a)
+                - linearly combine the next features (action value of next pair of action and states) with weight/theta
+                    Q(a′) ← Σi θi φ(s′, a′)i
+                - calculate the temporal difference:
+                    δ ← δ + γ max a′ Q(a′)
+                - set the traces of the non zero features of the current state and action to the features, and
+                  update the weights of all the recently active features with their traces, which then decay
+                  (dropped below trace_cutoff):
+                    θ ← θ + αδe
+                    e ← γλe
+                - re-assign the next set of features to the current state and features for the next iteration
+                    φ(s, a) ← φ(s', a')
+
+    :param env:          Environment of the game
+    :param max_episodes: Maximum number of episodes
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param lambda_:      Trace decay (λ), 0 is linear_q_learning
+    :param trace_cutoff: Traces below trace_cutoff are dropped (optional)
+    :param seed:         Pseudorandom number generator
+    :return:             Weights - the learnable parameter
+    """
+
+    random_state = np.random.RandomState(seed)
+    eta = np.linspace(eta, 0, max_episodes)
+    epsilon = np.linspace(epsilon, 0, max_episodes)
+    theta = np.zeros(env.n_features, dtype=float_dtype())
+    traces = SparseTraces(gamma * lambda_, trace_cutoff)
+
+    for i in range(max_episodes):
+        features = env.reset()
+        traces.clear()
+        e_selection = EpsilonGreedySelection(epsilon[i], random_state)
+        q = np.dot(features, theta)
+        done = False
+
+        while not done:
+            a = e_selection.select(q)
+            if q[a] != np.max(q):
+                traces.clear()
+            features_prime, r, done = env.step(a)
+            delta = r - q[a]
+            q = np.dot(features_prime, theta)
+            delta += gamma * np.max(q)
+            active = np.flatnonzero(features[a])
+            traces.replace(active, features[a, active])
+            traces.update(theta, eta[i] * delta)
+            features = features_prime
+
+    return theta
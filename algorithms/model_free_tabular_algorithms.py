@@ -1,9 +1,128 @@
 import numpy as np
 
+from algorithms.eligibility_traces import SparseTraces
 from algorithms.epsilon_greedy import EpsilonGreedySelection
+from algorithms.replay_buffer import ReplayBuffer
+from env.precision import float_dtype, policy_dtype
+from env.vector_environment import VectorEnvironment
 
 
-def sarsa(env, max_episodes, eta, gamma, epsilon, seed=None):
+def _argmax_random(action_values, tie):
+    """
+        Method to select an action that maximizes the action values, breaking ties with a pre-drawn random number
+        instead of drawing one, so that no array is created
+        (see EpsilonGreedySelection.argmax_random())
+        Algorithm:
+            1. Get the maximum action value and the number of actions that match it
+            2. If there is a single one, return its index
+            3. Else, return the k-th action with the maximum value, with k = ⌊tie * number of ties⌋
+
+    :param action_values: Action values as a list
+    :param tie: Random number between 0 and 1 to break the ties
+    :return: an action which maximizes the action values
+    """
+
+    max_value = max(action_values)
+    n_ties = action_values.count(max_value)
+
+    if n_ties == 1:
+        return action_values.index(max_value)
+
+    action = -1
+    for _ in range(int(tie * n_ties) + 1):
+        action = action_values.index(max_value, action + 1)
+
+    return action
+
+
+def _draw_block(random_state, env_random_state, block_size):
+    """
+        Method to draw a block of the random numbers used by the steps of _fast_td_control(), as lists so that they
+        are read without creating numpy scalars
+
+    :param random_state: Random state of the agent
+    :param env_random_state: Random state of the environment
+    :param block_size: Number of steps of the block
+    :return: exploration numbers, tie-break numbers, next state numbers as lists
+    """
+
+    return (random_state.random_sample(block_size).tolist(), random_state.random_sample(block_size).tolist(),
+            env_random_state.random_sample(block_size).tolist())
+
+
+def _fast_td_control(env, q, eta, gamma, epsilon, random_state, off_policy, block_size=1024):
+    """
+        Method to run the episodes of SARSA or Q-learning control without the per-step overhead of
+        EpsilonGreedySelection and env.step()
+        Algorithm:
+            1. initialization:
+                - get the sampling tables of env once (see EnvironmentModel.get_sampling_tables())
+            2. for each episode:
+                - reset env, each step (and the first action) uses the next exploration, tie-break and next state
+                  numbers, drawn in blocks of block_size steps that carry over between the episodes: the numbers of
+                  the agent from random_state, the next state numbers from the random state of env (see _draw_block())
+                - select actions ε-greedily from the blocks, a random action is ⌊tie * n_actions⌋ when exploring
+                  and the ties of the greedy action are broken with tie (see _argmax_random())
+                - draw the next state and reward by searching the cumulative probabilities of the sampling tables,
+                  the episode ends at the absorbing state or after env.max_steps steps, and takes at least one step
+                  as with env.step()
+                - update Q(s, a) with the SARSA target r + γ Q(s′, a′) or the Q-learning target
+                  r + γ maxa′Q(s′, a′)
+            3. leave env in the last state of the last episode
+        The results are reproducible for the same seeds, but differ from the results of the step by step loop
+        as the random numbers are drawn in a different order
+
+    :param env: Environment of the game with an absorbing state and sparse successor tables, e.g. FrozenLake
+    :param q: Action value array of shape n_states * n_actions, updated in place
+    :param eta: Learning rate (α) of each episode
+    :param gamma: Discount factor (γ)
+    :param epsilon: Exploration factor of each episode
+    :param random_state: Random state of the agent
+    :param off_policy: If True, the Q-learning target is used, else the SARSA target
+    :param block_size: Number of steps of the blocks of random numbers (optional)
+    :return: None
+    """
+
+    successors, cumulative_p, rewards = env.get_sampling_tables()
+    n_actions, absorbing_state, max_steps = env.n_actions, env.absorbing_state, env.max_steps
+
+    k = block_size
+
+    for i in range(len(eta)):
+        s = int(env.reset())
+        alpha, e = float(eta[i]), float(epsilon[i])
+
+        if k == block_size:
+            (explore, ties, draws), k = _draw_block(random_state, env.random_state, block_size), 0
+
+        q_s = q[s].tolist()
+        a = int(ties[k] * n_actions) if explore[k] < e else _argmax_random(q_s, ties[k])
+        k += 1
+
+        for t in range(1, max(max_steps, 1) + 1):
+            if k == block_size:
+                (explore, ties, draws), k = _draw_block(random_state, env.random_state, block_size), 0
+
+            j = cumulative_p[s, a].searchsorted(draws[k], side='right')
+            s_prime, r = int(successors[s, a, j]), float(rewards[s, a, j])
+
+            q_s_prime = q[s_prime].tolist()
+            a_prime = int(ties[k] * n_actions) if explore[k] < e else _argmax_random(q_s_prime, ties[k])
+            k += 1
+
+            target = max(q_s_prime) if off_policy else q_s_prime[a_prime]
+            q[s, a] = q_s[a] + alpha * (r + (gamma * target) - q_s[a])
+
+            q_s = q[s_prime].tolist() if s_prime == s else q_s_prime
+            s, a = s_prime, a_prime
+
+            if s == absorbing_state:
+                break
+
+        env.state, env.n_steps = s, t
+
+
+def sarsa(env, max_episodes, eta, gamma, epsilon, seed=None, fast=False):
     """
         Method to implement SARSA control
         Algorithm:
@@ -28,6 +147,76 @@ def sarsa(env, max_episodes, eta, gamma, epsilon, seed=None):
                     s ← s′
                     a ← a'
             4. Get the policy and value that maximizes the action value computed in step 3
+            With fast=True, steps 2 and 3 run with random numbers drawn in blocks per episode and without creating
+            numpy arrays at every step (see _fast_td_control())
+
+    :param env:          Environment of the game
+    :param max_episodes: Maximum number of episodes
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param seed:         Pseudorandom number generator
+    :param fast:         If True, the episodes are run with pre-drawn random numbers and lookups into the sampling
+                         tables of env (see _fast_td_control()), env must have an absorbing state (optional)
+    :return:             policy and value
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    eta = np.linspace(eta, 0, max_episodes)
+    epsilon = np.linspace(epsilon, 0, max_episodes)
+
+    q = np.zeros((env.n_states, env.n_actions), dtype=float_dtype())
+
+    if fast:
+        _fast_td_control(env, q, eta, gamma, epsilon, random_state, off_policy=False)
+    else:
+        for i in range(max_episodes):
+            s = env.reset()
+            e_selection = EpsilonGreedySelection(epsilon[i], random_state)
+            a = e_selection.select(q[s])
+            done = False
+
+            while not done:
+                s_prime, r, done = env.step(a)
+                a_prime = e_selection.select(q[s_prime])
+                q[s, a] += eta[i] * (r + (gamma * q[s_prime, a_prime]) - q[s, a])
+                s = s_prime
+                a = a_prime
+
+    policy = np.argmax(q, axis=1).astype(policy_dtype(env.n_actions))
+    value = np.max(q, axis=1)
+
+    return policy, value
+
+
+def q_learning(env, max_episodes, eta, gamma, epsilon, seed=None, fast=False):
+    """
+        Method to implement Q-learning control
+        Algorithm:
+            1. initialization:
+                - generate a random state for the game
+                - create evenly spaced learning rates (eta), exploration factor (epsilon) over maximum episodes
+                - action value function, initialized to zeroes of 2D array size - n_states * n_actions
+                    [[0 0 0 0]   --- state 1
+                      . . . .
+                      . . . .
+                     [0 0 0 0]]  --- state 17 (one extra state including the absorbing state)
+            2. for each episode:
+                - initialise the state for the episode i
+                - select an action from the random state with the epsilon-greedy policy
+                - execute step 3 till the end of game
+            3. while the terminal state is not reached:
+                - get the reward(r), game state(done) and next state (s')  for the selected action in the current state
+                - Select action a' for state s' according to an ε-greedy policy based on Q
+                - calculate the action value for the current state and action:
+                    Q(s, a) ← Q(s, a) + α * [r + γ * maxa′Q(s′, a′) − Q(s, a)]
+                - re-assign the next state and action to the current state and action for the next iteration
+                    s ← s′
+                    a ← a'
+            4. Get the policy and value that maximizes the action value computed in step 3
+            With fast=True, steps 2 and 3 run with random numbers drawn in blocks per episode and without creating
+            numpy arrays at every step (see _fast_td_control())
 
     :param env:          Environment of the game
     :param max_episodes: Maximum number of episodes
@@ -35,6 +224,8 @@ def sarsa(env, max_episodes, eta, gamma, epsilon, seed=None):
     :param gamma:        Discount factor (γ)
     :param epsilon:      Exploration factor
     :param seed:         Pseudorandom number generator
+    :param fast:         If True, the episodes are run with pre-drawn random numbers and lookups into the sampling
+                         tables of env (see _fast_td_control()), env must have an absorbing state (optional)
     :return:             policy and value
     """
 
@@ -43,48 +234,318 @@ def sarsa(env, max_episodes, eta, gamma, epsilon, seed=None):
     eta = np.linspace(eta, 0, max_episodes)
     epsilon = np.linspace(epsilon, 0, max_episodes)
 
-    q = np.zeros((env.n_states, env.n_actions))
+    q = np.zeros((env.n_states, env.n_actions), dtype=float_dtype())
+
+    if fast:
+        _fast_td_control(env, q, eta, gamma, epsilon, random_state, off_policy=True)
+    else:
+        for i in range(max_episodes):
+            s = env.reset()
+            e_selection = EpsilonGreedySelection(epsilon[i], random_state)
+            a = e_selection.select(q[s])
+            done = False
+
+            while not done:
+                s_prime, r, done = env.step(a)
+                a_prime = e_selection.select(q[s_prime])
+                q[s, a] += eta[i] * (r + (gamma * np.max(q[s_prime])) - q[s, a])
+                s = s_prime
+                a = a_prime
+
+    policy = np.argmax(q, axis=1).astype(policy_dtype(env.n_actions))
+    value = np.max(q, axis=1)
+
+    return policy, value
+
+
+def _scatter_update(q, states, actions, deltas):
+    """
+        Method to apply the updates of a batch of state action pairs to the action values in one scatter operation
+        The updates of colliding pairs are averaged, so that a pair visited by several slots gets a single update
+        with the mean of their TD errors instead of the sum, which would overshoot the targets
+
+    :param q: Action value array of shape n_states * n_actions, updated in place
+    :param states: Array of the states of the pairs
+    :param actions: Array of the actions of the pairs
+    :param deltas: Array of the updates of the pairs, learning rate times TD error
+    :return: None
+    """
+
+    pairs, inverse = np.unique((states * q.shape[1]) + actions, return_inverse=True)
+    q.reshape(-1)[pairs] += np.bincount(inverse, weights=deltas) / np.bincount(inverse)
+
+
+def _batched_td_control(env, max_episodes, eta, gamma, epsilon, n_envs, seed, off_policy):
+    """
+        Method to learn the action values with SARSA or Q-learning from n_envs copies of env stepped in lockstep
+        Algorithm:
+            1. initialization:
+                - copy env into n_envs slots (see VectorEnvironment), slot i runs episode i, with the learning rate
+                  and the exploration factor of episode i
+                - select the first action of each slot with a vectorized epsilon-greedy selection
+            2. while an episode is not over:
+                - step all the slots at once and select the next actions a′ of the next states s′
+                - calculate the TD errors of all the slots with the SARSA target r + γ Q(s′, a′) or the Q-learning
+                  target r + γ maxa′Q(s′, a′), and update Q for the slots whose episode is below max_episodes in one
+                  scatter operation (see _scatter_update())
+                - the slots that are done start the next episodes, and select the first action of their new state
+            3. Get the policy and value that maximizes the action value computed in step 2
+
+    :param env: Environment of the game with an absorbing state, e.g. FrozenLake
+    :param max_episodes: Maximum number of episodes over all the slots
+    :param eta: Learning rate (α)
+    :param gamma: Discount factor (γ)
+    :param epsilon: Exploration factor
+    :param n_envs: Number of copies of env
+    :param seed: Pseudorandom number generator
+    :param off_policy: If True, the Q-learning target is used, else the SARSA target
+    :return: policy and value
+    """
+
+    random_state = np.random.RandomState(seed)
+    vector_env = VectorEnvironment(env, n_envs, seed)
+
+    eta = np.append(np.linspace(eta, 0, max_episodes), 0)
+    epsilon = np.append(np.linspace(epsilon, 0, max_episodes), 0)
+
+    q = np.zeros((env.n_states, env.n_actions), dtype=float_dtype())
+
+    episodes = np.minimum(np.arange(n_envs), max_episodes)
+    next_episode = n_envs
+
+    e_selection = EpsilonGreedySelection(epsilon[episodes], random_state)
+    s = vector_env.states
+    a = e_selection.select_batch(q[s])
+
+    while np.any(episodes < max_episodes):
+        s_prime, r, done = vector_env.step(a)
+        a_prime = e_selection.select_batch(q[s_prime])
+
+        target = np.max(q[s_prime], axis=1) if off_policy else q[s_prime, a_prime]
+        active = episodes < max_episodes
+        _scatter_update(q, s[active], a[active], eta[episodes[active]] * (r + (gamma * target) - q[s, a])[active])
+
+        if np.any(done):
+            n_done = np.count_nonzero(done)
+            episodes[done] = np.minimum(np.arange(next_episode, next_episode + n_done), max_episodes)
+            next_episode += n_done
+
+            e_selection.epsilon = epsilon[episodes[done]]
+            a_prime[done] = e_selection.select_batch(q[vector_env.states[done]])
+            e_selection.epsilon = epsilon[episodes]
+
+        s = vector_env.states
+        a = a_prime
+
+    policy = np.argmax(q, axis=1).astype(policy_dtype(env.n_actions))
+    value = np.max(q, axis=1)
+
+    return policy, value
+
+
+def batched_sarsa(env, max_episodes, eta, gamma, epsilon, n_envs, seed=None):
+    """
+        Method to implement SARSA control with n_envs copies of env that share the action values
+        The copies are stepped in lockstep, the actions of all the copies are selected with one vectorized
+        epsilon-greedy call and the updates Q(s, a) ← Q(s, a) + α[r + γ * Q(s′, a′) − Q(s, a)] of all the copies are
+        applied in one scatter operation, the updates of colliding state action pairs are averaged
+        (see _batched_td_control())
+        max_episodes counts the episodes of all the copies, and episode i uses the learning rate and exploration
+        factor of episode i of sarsa(), so that the episodes are not longer, but more are run at once
+
+    :param env:          Environment of the game with an absorbing state, e.g. FrozenLake
+    :param max_episodes: Maximum number of episodes over all the copies
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param n_envs:       Number of copies of env
+    :param seed:         Pseudorandom number generator
+    :return:             policy and value
+    """
+
+    return _batched_td_control(env, max_episodes, eta, gamma, epsilon, n_envs, seed, off_policy=False)
+
+
+def batched_q_learning(env, max_episodes, eta, gamma, epsilon, n_envs, seed=None):
+    """
+        Method to implement Q-learning control with n_envs copies of env that share the action values
+        The copies are stepped in lockstep, the actions of all the copies are selected with one vectorized
+        epsilon-greedy call and the updates Q(s, a) ← Q(s, a) + α[r + γ * maxa′Q(s′, a′) − Q(s, a)] of all the copies
+        are applied in one scatter operation, the updates of colliding state action pairs are averaged
+        (see _batched_td_control())
+        max_episodes counts the episodes of all the copies, and episode i uses the learning rate and exploration
+        factor of episode i of q_learning(), so that the episodes are not longer, but more are run at once
+
+    :param env:          Environment of the game with an absorbing state, e.g. FrozenLake
+    :param max_episodes: Maximum number of episodes over all the copies
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param n_envs:       Number of copies of env
+    :param seed:         Pseudorandom number generator
+    :return:             policy and value
+    """
+
+    return _batched_td_control(env, max_episodes, eta, gamma, epsilon, n_envs, seed, off_policy=True)
+
+
+def replay_q_learning(env, max_episodes, eta, gamma, epsilon, capacity=10000, batch_size=32, seed=None):
+    """
+        Method to implement Q-learning control with experience replay
+        Algorithm:
+            1. initialization:
+                - generate a random state for the game
+                - create evenly spaced learning rates (eta), exploration factor (epsilon) over maximum episodes
+                - action value function, initialized to zeroes of 2D array size - n_states * n_actions
+                - replay buffer of capacity transitions (see ReplayBuffer)
+            2. for each episode:
+                - initialise the state for the episode i
+                - execute step 3 till the end of game
+            3. while the terminal state is not reached:
+                - select an action a for the state s according to an ε-greedy policy based on Q
+                - get the reward(r), game state(done) and next state (s′) for the selected action in the current state
+                - store the transition in the replay buffer, it is terminal if s′ is the absorbing state (the episodes
+                  that end after the maximum number of steps are not terminal)
+                - once the buffer holds batch_size transitions, sample a minibatch of transitions and update Q for all
+                  of them at once, with the targets of the non terminal transitions
+                    Q(s, a) ← Q(s, a) + α * [r + γ * maxa′Q(s′, a′) − Q(s, a)]
+                  the updates of colliding state action pairs are averaged (see _scatter_update())
+                - s ← s′
+            4. Get the policy and value that maximizes the action value computed in step 3
+
+    :param env:          Environment of the game with an absorbing state, e.g. FrozenLake
+    :param max_episodes: Maximum number of episodes
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param capacity:     Maximum number of transitions stored in the replay buffer (optional)
+    :param batch_size:   Number of transitions of the minibatch of each update (optional)
+    :param seed:         Pseudorandom number generator
+    :return:             policy and value
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    eta = np.linspace(eta, 0, max_episodes)
+    epsilon = np.linspace(epsilon, 0, max_episodes)
+
+    q = np.zeros((env.n_states, env.n_actions), dtype=float_dtype())
+    buffer = ReplayBuffer(capacity, env.n_states, env.n_actions, random_state)
 
     for i in range(max_episodes):
         s = env.reset()
         e_selection = EpsilonGreedySelection(epsilon[i], random_state)
+        done = False
+
+        while not done:
+            a = e_selection.select(q[s])
+            s_prime, r, done = env.step(a)
+            buffer.store(s, a, r, s_prime, s_prime == env.absorbing_state)
+
+            if len(buffer) >= batch_size:
+                states, actions, rewards, next_states, terminal = buffer.sample(batch_size)
+                targets = rewards + (gamma * np.where(terminal, 0, np.max(q[next_states], axis=1)))
+                _scatter_update(q, states, actions, eta[i] * (targets - q[states, actions]))
+
+            s = s_prime
+
+    policy = np.argmax(q, axis=1).astype(policy_dtype(env.n_actions))
+    value = np.max(q, axis=1)
+
+    return policy, value
+
+
+def sarsa_lambda(env, max_episodes, eta, gamma, epsilon, lambda_, trace_cutoff=0.01, seed=None):
+    """
+        Method to implement SARSA(λ) control with replacing eligibility traces
+        Algorithm:
+            1. initialization:
+                - generate a random state for the game
+                - create evenly spaced learning rates (eta), exploration factor (epsilon) over maximum episodes
+                - action value function, initialized to zeroes of 2D array size - n_states * n_actions
+                - sparse traces of the action values that decay by γλ per step (see SparseTraces)
+            2. for each episode:
+                - initialise the state for the episode i and clear the traces
+                - select an action from the random state with the epsilon-greedy policy
+                - execute step 3 till the end of game
+            3. while the terminal state is not reached:
+                - get the reward(r), game state(done) and next state (s')  for the selected action in the current state
+                - Select action a′ for state s′ according to an ε-greedy policy based on Q
+                - calculate the temporal difference:
+                    δ ← r + γ * Q(s′, a′) − Q(s, a)
+                - set the trace of the current state and action to 1, and update the action values of all the
+                  recently visited pairs with their traces, which then decay (dropped below trace_cutoff):
+                    Q ← Q + αδe
+                    e ← γλe
+                - re-assign the next state and action to the current state and action for the next iteration
+                    s ← s′
+                    a ← a'
+            4. Get the policy and value that maximizes the action value computed in step 3
+
+    :param env:          Environment of the game
+    :param max_episodes: Maximum number of episodes
+    :param eta:          Learning rate (α)
+    :param gamma:        Discount factor (γ)
+    :param epsilon:      Exploration factor
+    :param lambda_:      Trace decay (λ), 0 is one-step SARSA
+    :param trace_cutoff: Traces below trace_cutoff are dropped (optional)
+    :param seed:         Pseudorandom number generator
+    :return:             policy and value
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    eta = np.linspace(eta, 0, max_episodes)
+    epsilon = np.linspace(epsilon, 0, max_episodes)
+
+    q = np.zeros((env.n_states, env.n_actions), dtype=float_dtype())
+    traces = SparseTraces(gamma * lambda_, trace_cutoff)
+
+    for i in range(max_episodes):
+        s = env.reset()
+        traces.clear()
+        e_selection = EpsilonGreedySelection(epsilon[i], random_state)
         a = e_selection.select(q[s])
         done = False
 
         while not done:
             s_prime, r, done = env.step(a)
             a_prime = e_selection.select(q[s_prime])
-            q[s, a] += eta[i] * (r + (gamma * q[s_prime, a_prime]) - q[s, a])
+            delta = r + (gamma * q[s_prime, a_prime]) - q[s, a]
+            traces.replace((s * env.n_actions + a,), (1.,))
+            traces.update(q.reshape(-1), eta[i] * delta)
             s = s_prime
             a = a_prime
 
-    policy = np.argmax(q, axis=1)
+    policy = np.argmax(q, axis=1).astype(policy_dtype(env.n_actions))
     value = np.max(q, axis=1)
 
     return policy, value
 
 
-def q_learning(env, max_episodes, eta, gamma, epsilon, seed=None):
+def q_lambda(env, max_episodes, eta, gamma, epsilon, lambda_, trace_cutoff=0.01, seed=None):
     """
-        Method to implement Q-learning control
+        Method to implement Watkins's Q(λ) control with replacing eligibility traces
         Algorithm:
             1. initialization:
                 - generate a random state for the game
                 - create evenly spaced learning rates (eta), exploration factor (epsilon) over maximum episodes
                 - action value function, initialized to zeroes of 2D array size - n_states * n_actions
-                    [[0 0 0 0]   --- state 1
-                      . . . .
-                      . . . .
-                     [0 0 0 0]]  --- state 17 (one extra state including the absorbing state)
+                - sparse traces of the action values that decay by γλ per step (see SparseTraces)
             2. for each episode:
-                - initialise the state for the episode i
+                - initialise the state for the episode i and clear the traces
                 - select an action from the random state with the epsilon-greedy policy
                 - execute step 3 till the end of game
             3. while the terminal state is not reached:
                 - get the reward(r), game state(done) and next state (s')  for the selected action in the current state
                 - Select action a' for state s' according to an ε-greedy policy based on Q
-                - calculate the action value for the current state and action:
-                    Q(s, a) ← Q(s, a) + α * [r + γ * maxa′Q(s′, a′) − Q(s, a)]
+                - calculate the temporal difference:
+                    δ ← r + γ * maxa′Q(s′, a′) − Q(s, a)
+                - set the trace of the current state and action to 1, and update the action values of all the
+                  recently visited pairs with their traces, which then decay (dropped below trace_cutoff):
+                    Q ← Q + αδe
+                    e ← γλe
+                - clear the traces if a′ is an exploratory action, as the later rewards don't follow the greedy policy
                 - re-assign the next state and action to the current state and action for the next iteration
                     s ← s′
                     a ← a'
@@ -95,6 +556,8 @@ def q_learning(env, max_episodes, eta, gamma, epsilon, seed=None):
     :param eta:          Learning rate (α)
     :param gamma:        Discount factor (γ)
     :param epsilon:      Exploration factor
+    :param lambda_:      Trace decay (λ), 0 is one-step Q-learning
+    :param trace_cutoff: Traces below trace_cutoff are dropped (optional)
     :param seed:         Pseudorandom number generator
     :return:             policy and value
     """
@@ -104,10 +567,12 @@ def q_learning(env, max_episodes, eta, gamma, epsilon, seed=None):
     eta = np.linspace(eta, 0, max_episodes)
     epsilon = np.linspace(epsilon, 0, max_episodes)
 
-    q = np.zeros((env.n_states, env.n_actions))
+    q = np.zeros((env.n_states, env.n_actions), dtype=float_dtype())
+    traces = SparseTraces(gamma * lambda_, trace_cutoff)
 
     for i in range(max_episodes):
         s = env.reset()
+        traces.clear()
         e_selection = EpsilonGreedySelection(epsilon[i], random_state)
         a = e_selection.select(q[s])
         done = False
@@ -115,11 +580,17 @@ def q_learning(env, max_episodes, eta, gamma, epsilon, seed=None):
         while not done:
             s_prime, r, done = env.step(a)
             a_prime = e_selection.select(q[s_prime])
-            q[s, a] += eta[i] * (r + (gamma * np.max(q[s_prime])) - q[s, a])
+            max_q = np.max(q[s_prime])
+            greedy = q[s_prime, a_prime] == max_q
+            delta = r + (gamma * max_q) - q[s, a]
+            traces.replace((s * env.n_actions + a,), (1.,))
+            traces.update(q.reshape(-1), eta[i] * delta)
+            if not greedy:
+                traces.clear()
             s = s_prime
             a = a_prime
 
-    policy = np.argmax(q, axis=1)
+    policy = np.argmax(q, axis=1).astype(policy_dtype(env.n_actions))
     value = np.max(q, axis=1)
 
     return policy, value
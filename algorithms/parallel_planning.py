@@ -0,0 +1,252 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from algorithms.model_based_tabular_algorithms import policy_improvement
+from env.precision import float_dtype, policy_dtype
+
+
+def _share(arrays):
+    """
+        Method to copy arrays into new blocks of shared memory, so that worker processes can attach to them by name
+        without copying or pickling the arrays
+
+    :param arrays: list of numpy arrays
+    :return: list of shared memory blocks, list of name, shape, dtype tuples to attach to them (see _attach()),
+             list of numpy arrays backed by the blocks
+    """
+
+    blocks, specs, shared_arrays = [], [], []
+
+    for array in arrays:
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared_array[...] = array
+
+        blocks.append(block)
+        specs.append((block.name, array.shape, array.dtype.str))
+        shared_arrays.append(shared_array)
+
+    return blocks, specs, shared_arrays
+
+
+def _attach(specs):
+    """
+        Method to attach to blocks of shared memory created by _share() and view them as numpy arrays
+
+    :param specs: list of name, shape, dtype tuples
+    :return: list of shared memory blocks, list of numpy arrays backed by the blocks
+    """
+
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs]
+    arrays = [np.ndarray(shape, dtype=dtype, buffer=block.buf) for block, (_, shape, dtype) in zip(blocks, specs)]
+
+    return blocks, arrays
+
+
+def _backup_block(arrays, start, stop, gamma, barrier, index):
+    """
+        Method to back up the values of the block of states [start, stop) once per sweep until the stop flag is set
+        Algorithm:
+            1. select the rows of the block once (only the action chosen by the policy if a policy is shared)
+            2. loop:
+                - wait at the barrier for the start of a sweep, leave the loop if the stop flag is set
+                - calculate the new values of the block from the current value array, and write them to the block of
+                  the other value array
+                - write the maximum exact difference between current and new values of the block to deltas[index]
+                - wait at the barrier for the end of the sweep
+
+    :param arrays: list of successors, probabilities, expected rewards, values, deltas, control and optionally
+                   policy arrays backed by shared memory
+    :param start: First state of the block
+    :param stop: State after the last state of the block
+    :param gamma: Parameter to decay the future rewards
+    :param barrier: Barrier shared by the workers and the main process to synchronise at sweep boundaries
+    :param index: Index of the worker
+    :return: None
+    """
+
+    successors, p, expected_r, values, deltas, control = arrays[:6]
+    successors, p, expected_r = successors[start:stop], p[start:stop], expected_r[start:stop]
+
+    if len(arrays) > 6:
+        states, policy = np.arange(stop - start), arrays[6][start:stop]
+        successors, p, expected_r = successors[states, policy], p[states, policy], expected_r[states, policy]
+
+    while True:
+        barrier.wait()
+        if control[0]:
+            break
+
+        value = values[control[1]]
+        new_value = expected_r + (gamma * np.sum(p * value[successors], axis=-1))
+        if new_value.ndim > 1:
+            new_value = np.max(new_value, axis=1)
+
+        deltas[index] = np.max(np.abs(new_value - value[start:stop]), initial=0)
+        values[1 - control[1], start:stop] = new_value
+
+        barrier.wait()
+
+
+def _backup_worker(specs, start, stop, gamma, barrier, index):
+    """
+        Method run by each worker process, attaches to the shared arrays and backs up its block of states every sweep
+        (see _backup_block())
+        If the worker fails, the barrier is aborted so that the other processes do not wait forever
+
+    :param specs: list of name, shape, dtype tuples of successors, probabilities, expected rewards, values, deltas,
+                  control and optionally policy (see _share())
+    :param start: First state of the block
+    :param stop: State after the last state of the block
+    :param gamma: Parameter to decay the future rewards
+    :param barrier: Barrier shared by the workers and the main process to synchronise at sweep boundaries
+    :param index: Index of the worker
+    :return: None
+    """
+
+    blocks, arrays = _attach(specs)
+
+    try:
+        _backup_block(arrays, start, stop, gamma, barrier, index)
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+def _parallel_sweeps(env, gamma, theta, max_iterations, n_workers, value, policy=None):
+    """
+        Method to run synchronous (Jacobi) sweeps of the Bellman backups of env over the states split into blocks
+        between worker processes, until convergence
+        Algorithm:
+            1. initialisation:
+                - copy the sparse successor tables and the expected rewards R(s, a) of env, two value arrays (current
+                  and next), the deltas of the workers, a control array (stop flag, index of the current value array)
+                  and the policy if one is evaluated into shared memory
+                - split the states into n_workers contiguous blocks and start a worker process for each block
+                  (see _backup_worker())
+            2. while stop condition or maximum number of iterations is not reached:
+                - release the workers at the start barrier, and wait at the end barrier until every block is backed up
+                - swap the current and next value arrays and get the maximum exact difference over the blocks
+            3. set the stop flag, release the workers and wait for them to exit, then free the shared memory
+
+    :param env: Environment with sparse successor tables, e.g. FrozenLake or GridWorld
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of sweeps
+    :param n_workers: Number of worker processes
+    :param value: Initial value array, zeros if None
+    :param policy: Policy to be evaluated, the maximum over all actions is backed up if None (optional)
+    :return: value array
+    """
+
+    if n_workers < 1:
+        raise Exception('Invalid Number of Workers!!!')
+
+    n_workers = min(n_workers, env.n_states)
+
+    successors, p, _ = env.get_sparse_prob_rewards()
+    values = np.zeros((2, env.n_states), dtype=float_dtype())
+    if value is not None:
+        values[0] = value
+
+    arrays = [successors, p, env.get_expected_rewards(), values, np.zeros(n_workers, dtype=float_dtype()),
+              np.zeros(2, dtype=np.int64)]
+    if policy is not None:
+        arrays.append(np.asarray(policy))
+
+    blocks, specs, arrays = _share(arrays)
+    values, deltas, control = arrays[3:6]
+
+    context = multiprocessing.get_context()
+    barrier = context.Barrier(n_workers + 1)
+    bounds = np.linspace(0, env.n_states, n_workers + 1).astype(int)
+    workers = [context.Process(target=_backup_worker,
+                               args=(specs, bounds[i], bounds[i + 1], gamma, barrier, i), daemon=True)
+               for i in range(n_workers)]
+
+    try:
+        for worker in workers:
+            worker.start()
+
+        curr_iteration = 0
+        stop = False
+
+        while curr_iteration < max_iterations and not stop:
+            barrier.wait()
+            barrier.wait()
+
+            control[1] = 1 - control[1]
+
+            curr_iteration += 1
+            stop = np.max(deltas) < theta
+
+        value = values[control[1]].copy()
+
+        control[0] = 1
+        barrier.wait()
+    finally:
+        if not control[0]:
+            barrier.abort()
+
+        for worker in workers:
+            worker.join()
+
+        del arrays, values, deltas, control
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return value
+
+
+def parallel_policy_evaluation(env, policy, gamma, theta, max_iterations, n_workers=None, value=None):
+    """
+        Method to evaluate a policy with synchronous (Jacobi) updates split between worker processes
+        The transition model and the value arrays live in shared memory, each worker backs up a contiguous block of
+        states per sweep and the workers synchronise at the sweep boundaries (see _parallel_sweeps()), so that the
+        values are the same as the values of policy_evaluation() with synchronous=True
+
+    :param env: Environment with sparse successor tables for which the policy should be evaluated
+    :param policy: Policy that has to be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1.
+    :param theta: Threshold that is used to identify when to stop the policy evaluation
+    :param max_iterations: Maximum number of time-steps allowed for evaluating the policy
+    :param n_workers: Number of worker processes, the number of CPUs if None (optional)
+    :param value: Initial value array, zeros if None (optional)
+    :return: value array
+    """
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+
+    return _parallel_sweeps(env, gamma, theta, max_iterations, n_workers, value, policy)
+
+
+def parallel_value_iteration(env, gamma, theta, max_iterations, n_workers=None, value=None):
+    """
+        Method to perform value iteration with synchronous (Jacobi) updates split between worker processes
+        The transition model and the value arrays live in shared memory, each worker backs up a contiguous block of
+        states per sweep and the workers synchronise at the sweep boundaries (see _parallel_sweeps()), so that the
+        policy and values are the same as the ones of value_iteration() with synchronous=True
+
+    :param env: Environment with sparse successor tables for which the policy should be evaluated
+    :param gamma: Parameter to decay the future rewards, should be between 0 and 1
+    :param theta: Threshold that is used to identify when to stop the policy evaluation
+    :param max_iterations: Maximum number of time-steps allowed for evaluating the policy
+    :param n_workers: Number of worker processes, the number of CPUs if None (optional)
+    :param value: Initial value array, zeros if None (optional)
+    :return: Policy and Value arrays as a tuple
+    """
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+
+    value = _parallel_sweeps(env, gamma, theta, max_iterations, n_workers, value)
+    policy, _ = policy_improvement(env, np.zeros(env.n_states, dtype=policy_dtype(env.n_actions)), value, gamma)
+
+    return policy, value
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+        Ring buffer of the transitions (s, a, r, s′, done) seen by an agent, to update the agent from minibatches of
+        past transitions instead of only the last one
+        The transitions are stored in preallocated arrays of compact types (int32 states, int8 actions, float32
+        rewards, bool done flags), once the buffer is full the oldest transition is overwritten
+    """
+
+    def __init__(self, capacity, n_states, n_actions, random_state=None):
+        """
+            Constructor for ReplayBuffer
+            Throws an exception if the states or actions do not fit in the types of the arrays
+
+        :param capacity: Maximum number of transitions stored
+        :param n_states: Number of states of the environment
+        :param n_actions: Number of actions of the environment
+        :param random_state: random state used to sample minibatches (optional)
+        """
+
+        if n_states > np.iinfo(np.int32).max + 1 or n_actions > np.iinfo(np.int8).max + 1:
+            raise Exception('Invalid Number of States or Actions!!!')
+
+        self.capacity = capacity
+        self.random_state = np.random.RandomState() if random_state is None else random_state
+
+        self.states = np.zeros(self.capacity, dtype=np.int32)
+        self.actions = np.zeros(self.capacity, dtype=np.int8)
+        self.rewards = np.zeros(self.capacity, dtype=np.float32)
+        self.next_states = np.zeros(self.capacity, dtype=np.int32)
+        self.done = np.zeros(self.capacity, dtype=bool)
+
+        self.size = 0
+        self.position = 0
+
+    def __len__(self):
+        """
+            Method to get the number of transitions stored
+
+        :return: number of transitions stored
+        """
+
+        return self.size
+
+    def store(self, state, action, reward, next_state, done):
+        """
+            Method to store a transition at the current position of the ring, overwriting the oldest transition if
+            the buffer is full
+
+        :param state: Current state
+        :param action: Action taken in the current state
+        :param reward: Reward for the transition
+        :param next_state: Next state
+        :param done: True if next_state is terminal, so that its value is not used for the targets
+        :return: None
+        """
+
+        self.states[self.position] = state
+        self.actions[self.position] = action
+        self.rewards[self.position] = reward
+        self.next_states[self.position] = next_state
+        self.done[self.position] = done
+
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size):
+        """
+            Method to sample a minibatch of the stored transitions uniformly with replacement
+
+        :param batch_size: Number of transitions of the minibatch
+        :return: states, actions, rewards, next states, done flags of the minibatch as numpy arrays
+        """
+
+        i = self.random_state.randint(0, self.size, batch_size)
+
+        return self.states[i], self.actions[i], self.rewards[i], self.next_states[i], self.done[i]
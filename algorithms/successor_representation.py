@@ -0,0 +1,82 @@
+import numpy as np
+
+from algorithms.model_based_tabular_algorithms import _policy_transition_matrix
+from env.precision import float_dtype, policy_dtype
+
+
+class SuccessorRepresentation:
+    """
+        Class to evaluate a fixed policy of env for many reward functions, e.g. the rewards of different goal tiles
+        on the same lake. The successor representation of the policy is the expected discounted number of visits of
+        every state from every state
+            M = (I - γ P_π)^-1
+        and is calculated once, so that the values of the policy for any reward function are a matrix product
+            V = M R_π
+        The successor representation is a dense matrix of size number of states * number of states
+    """
+
+    def __init__(self, env, policy, gamma):
+        """
+            Constructor for SuccessorRepresentation
+            1. initialization
+                - build the dense transition matrix P_π of the policy
+                - invert (I - γ P_π) to get the successor representation
+                - get the sparse successor tables of env to calculate the action values for policy improvement
+
+        :param env: Environment for which the policy should be evaluated
+        :param policy: Policy that has to be evaluated
+        :param gamma: Parameter to decay the future rewards, should be between 0 and 1 (excluded)
+        """
+
+        self.env = env
+        self.policy = np.asarray(policy)
+        self.gamma = gamma
+
+        self.n_states = self.env.n_states
+        self.n_actions = self.env.n_actions
+
+        p_pi = _policy_transition_matrix(self.env, self.policy)
+        self.successor_representation = np.linalg.inv(np.identity(self.n_states, dtype=float_dtype()) -
+                                                      (self.gamma * p_pi))
+
+        self._successors, self._p, _ = self.env.get_sparse_prob_rewards()
+
+    def values(self, rewards):
+        """
+            Method to calculate the values of the policy for a batch of reward functions
+            Algorithm:
+                1. select the rewards R_π(s) = R(s, π(s)) of the action chosen by the policy in each state
+                2. calculate the values of all the reward functions with a single matrix product with the successor
+                   representation
+
+        :param rewards: Expected rewards R(s, a) as an array of shape number of states * number of actions
+                        (see EnvironmentModel.get_expected_rewards()), or a batch of them with an additional first axis
+        :return: value array, or a value array for each reward function of the batch
+        """
+
+        rewards = np.asarray(rewards, dtype=float_dtype())
+        policy_rewards = rewards[..., np.arange(self.n_states), self.policy]
+
+        return np.matmul(policy_rewards, self.successor_representation.T)
+
+    def policy_improvement(self, rewards):
+        """
+            Method to improve the policy for a batch of reward functions based on the values of the policy
+            Algorithm:
+                1. calculate the values of the policy for all the reward functions (see values())
+                2. calculate the values of all actions of all states for all the reward functions with a single
+                   tensor contraction of the sparse probabilities with the values
+                3. Assign the action with maximum value to improved policy array of each reward function
+
+        :param rewards: Expected rewards R(s, a) as an array of shape number of states * number of actions,
+                        or a batch of them with an additional first axis
+        :return: Improved policy and Value arrays of the policy as a tuple, or arrays for each reward function of
+                 the batch
+        """
+
+        rewards = np.asarray(rewards, dtype=float_dtype())
+        value = self.values(rewards)
+
+        action_values = rewards + (self.gamma * np.sum(self._p * value[..., self._successors], axis=-1))
+
+        return np.argmax(action_values, axis=-1).astype(policy_dtype(self.n_actions)), value
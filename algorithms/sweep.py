@@ -0,0 +1,166 @@
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from algorithms.linear_wrapper import LinearWrapper
+from algorithms.model_based_tabular_algorithms import policy_iteration, value_iteration
+from algorithms.model_free_non_tabular_algorithms import linear_q_learning, linear_sarsa
+from algorithms.model_free_tabular_algorithms import q_learning, sarsa
+from env.frozenlake_environment import FrozenLake
+from env.precision import get_precision, precision
+
+# Default values of the parameters of the algorithms that are not swept
+default_parameters = {'max_episodes': 1000, 'eta': 0.5, 'epsilon': 0.5, 'gamma': 0.9, 'theta': 0.001,
+                      'max_iterations': 100}
+
+# Algorithms of the sweeps: function of the algorithm, parameters it uses, True if it depends on the seed
+algorithms = {
+    'sarsa': (sarsa, ('max_episodes', 'eta', 'gamma', 'epsilon'), True),
+    'q_learning': (q_learning, ('max_episodes', 'eta', 'gamma', 'epsilon'), True),
+    'linear_sarsa': (linear_sarsa, ('max_episodes', 'eta', 'gamma', 'epsilon'), True),
+    'linear_q_learning': (linear_q_learning, ('max_episodes', 'eta', 'gamma', 'epsilon'), True),
+    'policy_iteration': (policy_iteration, ('gamma', 'theta', 'max_iterations'), False),
+    'value_iteration': (value_iteration, ('gamma', 'theta', 'max_iterations'), False),
+}
+
+
+def _run_algorithm(name, env, parameters, seed):
+    """
+        Method to run an algorithm of the sweeps on env with its parameters
+        The linear algorithms are run on env wrapped in a LinearWrapper, and their weights are decoded into the
+        policy and value
+
+    :param name: Name of the algorithm (see algorithms)
+    :param env: Environment of the run
+    :param parameters: Dictionary of the parameters used by the algorithm
+    :param seed: Seed of the algorithm, unused by the planners
+    :return: policy and value
+    """
+
+    function, parameter_names, seeded = algorithms[name]
+    arguments = [parameters[parameter] for parameter in parameter_names]
+
+    if not seeded:
+        return function(env, *arguments)
+
+    if name.startswith('linear_'):
+        linear_env = LinearWrapper(env)
+        return linear_env.decode_policy(function(linear_env, *arguments, seed=seed))
+
+    return function(env, *arguments, seed=seed)
+
+
+def _run_task(task):
+    """
+        Method run by the worker processes for each run of a sweep, creates the FrozenLake of the run and runs the
+        algorithm with the numeric precision of the main process
+
+    :param task: algorithm name, parameters, environment seed, algorithm seed, lake, slip, max_steps, sparse and
+                 precision of the run as a tuple
+    :return: policy, value, wall time in seconds as a tuple
+    """
+
+    name, parameters, env_seed, seed, lake, slip, max_steps, sparse, precision_name = task
+
+    with precision(precision_name):
+        env = FrozenLake(lake, slip, max_steps, seed=env_seed, sparse=sparse)
+
+        start = time.perf_counter()
+        policy, value = _run_algorithm(name, env, parameters, seed)
+
+    return policy, value, time.perf_counter() - start
+
+
+def run_sweep(lake, names, grid=None, n_seeds=10, seed=None, max_workers=None, slip=0.1, max_steps=None,
+              sparse=False):
+    """
+        Method to run algorithms on a FrozenLake for a grid of parameters and a number of seeds in a process pool
+        Algorithm:
+            1. initialization:
+                - spawn n_seeds independent seed sequences from seed, and draw the seed of the environment and the
+                  seed of the algorithm of each one, so that run k of every configuration uses the same random
+                  number streams, whatever the number of workers
+                - for each algorithm, the configurations are the product of the values in grid of the parameters
+                  it uses, the other parameters take their default values (see default_parameters)
+                - the planners don't depend on the seed, they are run once per configuration
+            2. run all the runs in a ProcessPoolExecutor (see _run_task()), the results are collected in the order
+               of the runs
+            3. aggregate the runs of each configuration into a row of the result table
+
+    :param lake: Lake of the FrozenLake as a 2D list
+    :param names: Names of the algorithms to be swept (see algorithms)
+    :param grid: Dictionary of parameter name to list of values, e.g. {'eta': [0.25, 0.5], 'gamma': [0.9, 0.99]}
+                 (optional)
+    :param n_seeds: Number of seeds per configuration of the algorithms that depend on the seed (optional)
+    :param seed: A seed to control the seed sequences of the runs (optional)
+    :param max_workers: Number of worker processes, the number of CPUs if None (optional)
+    :param slip: Probability of slipping of the FrozenLake (optional)
+    :param max_steps: Maximum number of steps of an episode, the number of tiles of the lake if None (optional)
+    :param sparse: If True, only the sparse successor tables are created for the model (optional)
+    :return: list of rows with the algorithm, its parameters, the policies, values and wall times of the runs
+             as arrays stacked over the seeds, their means and standard deviations, and the majority policy with
+             the fraction of runs that agree with it
+    """
+
+    grid = {} if grid is None else grid
+    max_steps = np.size(lake) if max_steps is None else max_steps
+
+    for name in names:
+        if name not in algorithms:
+            raise Exception('Invalid Algorithm!!!')
+
+    seeds = [tuple(int(s) for s in child.generate_state(2)) for child in np.random.SeedSequence(seed).spawn(n_seeds)]
+
+    configurations = []
+    for name in names:
+        _, parameter_names, seeded = algorithms[name]
+        swept = [parameter for parameter in parameter_names if parameter in grid]
+
+        for values in itertools.product(*(grid[parameter] for parameter in swept)):
+            parameters = {parameter: default_parameters[parameter] for parameter in parameter_names}
+            parameters.update(zip(swept, values))
+            configurations.append((name, parameters, seeds if seeded else seeds[:1]))
+
+    tasks = [(name, parameters, env_seed, algorithm_seed, lake, slip, max_steps, sparse, get_precision())
+             for name, parameters, run_seeds in configurations for env_seed, algorithm_seed in run_seeds]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        runs = iter(list(executor.map(_run_task, tasks)))
+
+    table = []
+    for name, parameters, run_seeds in configurations:
+        policies, values, seconds = (np.array(result) for result in zip(*itertools.islice(runs, len(run_seeds))))
+
+        votes = [np.sum(policies == action, axis=0) for action in range(np.max(policies) + 1)]
+        policy = np.argmax(votes, axis=0).astype(policies.dtype)
+
+        table.append({'algorithm': name, 'parameters': parameters, 'n_seeds': len(run_seeds),
+                      'policies': policies, 'values': values, 'seconds': seconds,
+                      'policy': policy, 'policy_agreement': np.mean(policies == policy, axis=0),
+                      'value_mean': np.mean(values, axis=0), 'value_std': np.std(values, axis=0),
+                      'seconds_mean': np.mean(seconds), 'seconds_std': np.std(seconds)})
+
+    return table
+
+
+def print_sweep(table, state=0):
+    """
+        Method to print the result table of a sweep, with the mean and standard deviation of the value of a state,
+        the mean fraction of runs that agree with the majority policy and the mean and standard deviation of the wall
+        time of the runs of each configuration
+
+    :param table: Result table returned by run_sweep()
+    :param state: State whose value is printed, the first state if not given (optional)
+    :return: None
+    """
+
+    print('{:>18} {:>52} {:>6} {:>18} {:>10} {:>20}'.format('algorithm', 'parameters', 'seeds', 'value', 'agreement',
+                                                          'seconds'))
+
+    for row in table:
+        parameters = ', '.join('{}={:g}'.format(parameter, value) for parameter, value in row['parameters'].items())
+        print('{:>18} {:>52} {:>6} {:>9.4f} ± {:<6.4f} {:>10.3f} {:>11.4f} ± {:<6.4f}'.format(
+            row['algorithm'], parameters, row['n_seeds'], row['value_mean'][state], row['value_std'][state],
+            np.mean(row['policy_agreement']), row['seconds_mean'], row['seconds_std']))
@@ -0,0 +1,171 @@
+import numpy as np
+
+from env.env_helper import sparse_probability, sparse_reward
+from env.environment import Environment
+from env.precision import float_dtype, policy_dtype
+
+
+class CompactEnvironment(Environment):
+    """
+        Wrapper for env that only keeps the states reachable from the starting states, e.g. to drop the obstacles of
+        GridWorld and the cells of a maze that are walled off from the start
+        The reachable states are indexed densely in the order of their index in env, so that the models of the
+        planners and the Q-tables of the learners are only as big as the reachable part of env
+    """
+
+    def __init__(self, env, seed=None):
+        """
+            Constructor for CompactEnvironment
+            1. initialization
+                - search the states reachable from the starting states with a probability greater than 0 by any action,
+                  one level of successors at a time (the absorbing state is always kept)
+                - map the reachable states of env to a dense index (reachable_states), and the states of env to their
+                  dense index or -1 if they are not reachable (compact_index)
+                - select the rows of the reachable states from the sparse successor tables of env and map the
+                  successors to the dense index, successors with a probability of 0 that are not reachable become
+                  padding with the state itself
+                - select the dense probabilities and rewards of the reachable states if env is not sparse
+
+        :param env: Environment with an absorbing state to be compacted, e.g. FrozenLake or GridWorld
+        :param seed: A seed to control the random number generator (optional)
+        """
+
+        self.env = env
+        self.sparse = self.env.sparse
+
+        successors, p, r = self.env.get_sparse_prob_rewards()
+
+        reachable = np.zeros(self.env.n_states, dtype=bool)
+        reachable[np.flatnonzero(self.env.pi)] = True
+        reachable[self.env.absorbing_state] = True
+        frontier = np.flatnonzero(reachable)
+
+        while frontier.size:
+            next_states = successors[frontier][p[frontier] > 0]
+            frontier = np.unique(next_states[~reachable[next_states]])
+            reachable[frontier] = True
+
+        self.reachable_states = np.flatnonzero(reachable)
+        self.compact_index = np.full(self.env.n_states, -1, dtype=int)
+        self.compact_index[self.reachable_states] = np.arange(self.reachable_states.size)
+
+        self.absorbing_state = self.compact_index[self.env.absorbing_state]
+
+        super(CompactEnvironment, self).__init__(self.reachable_states.size, self.env.n_actions, self.env.max_steps,
+                                                 self.env.pi[self.reachable_states], seed)
+
+        self._successors = self.compact_index[successors[self.reachable_states]].astype(successors.dtype)
+        unreachable = self._successors < 0
+        self._successors[unreachable] = np.nonzero(unreachable)[0]
+        self._successor_p = p[self.reachable_states]
+        self._successor_r = r[self.reachable_states]
+
+        if not self.sparse:
+            dense_p, dense_r = self.env.get_prob_rewards()
+            self._p = dense_p[np.ix_(self.reachable_states, self.reachable_states)]
+            self._r = dense_r[np.ix_(self.reachable_states, self.reachable_states)]
+
+    def p(self, next_state, state, action):
+        """
+            Method to return the probability of transitioning from current state to the next state with action
+
+        :param next_state: Dense index of next state
+        :param state: Dense index of current state
+        :param action: Action to be taken
+        :return: Probability of transitioning between state and next_state with action
+        """
+
+        if self.sparse:
+            return sparse_probability(self._successors, self._successor_p, next_state, state, action)
+
+        return self._p[state, next_state, action]
+
+    def r(self, next_state, state, action):
+        """
+            Method to return the reward when transitioning from current state to the next state with action
+
+        :param next_state: Dense index of next state
+        :param state: Dense index of current state
+        :param action: Action to be taken
+        :return: Reward for transitioning between state and next_state with action
+        """
+
+        if self.sparse:
+            return sparse_reward(self._successors, self._successor_r, next_state, state, action)
+
+        return self._r[state, next_state, action]
+
+    def step(self, action):
+        """
+            Method to take a step for choosing action from current state
+
+        :param action: Action to be taken
+        :return: next state, reward, done as a tuple for taking action
+        """
+
+        state, reward, done = super(CompactEnvironment, self).step(action)
+
+        done = (state == self.absorbing_state) or done
+
+        return state, reward, done
+
+    def get_prob_rewards(self):
+        """
+            Method to get the probabilities and rewards of the reachable states.
+            Raises RuntimeError if env was created with sparse=True, use get_sparse_prob_rewards() instead
+
+        :return: probabilities, rewards as numpy arrays
+        """
+
+        if self.sparse:
+            raise RuntimeError('Dense probabilities and rewards are not created for a sparse environment')
+
+        return self._p, self._r
+
+    def get_sparse_prob_rewards(self):
+        """
+            Method to get the sparse successor tables of the reachable states, in the layout of the tables of env
+            with the states mapped to their dense index
+
+        :return: successors, probabilities, rewards as numpy arrays
+        """
+
+        return self._successors, self._successor_p, self._successor_r
+
+    def expand(self, policy, value):
+        """
+            Method to map a policy and value of the reachable states back to all the states of env
+            The states that are not reachable get the action 0 and the value 0
+
+        :param policy: Policy array over the dense index
+        :param value: Value array over the dense index
+        :return: Policy and Value arrays over the states of env as a tuple
+        """
+
+        full_policy = np.zeros(self.env.n_states, dtype=policy_dtype(self.n_actions))
+        full_value = np.zeros(self.env.n_states, dtype=float_dtype())
+
+        full_policy[self.reachable_states] = policy
+        full_value[self.reachable_states] = value
+
+        return full_policy, full_value
+
+    def render(self, policy=None, value=None):
+        """
+            Method to visualize env with the current state, or the policy and value mapped back to the states of env
+            (see expand()), the state of env is restored after rendering
+
+        :param policy: policy to be rendered
+        :param value: value to be rendered
+        :return: None
+        """
+
+        env_state, self.env.state = self.env.state, self.reachable_states[self.state]
+
+        try:
+            if policy is None:
+                self.env.render()
+            else:
+                self.env.render(*self.expand(policy, value))
+        finally:
+            self.env.state = env_state
@@ -1,3 +1,8 @@
+import numpy as np
+
+from env.precision import float_dtype, index_dtype
+
+
 def position_to_index(x, y, num_cols):
     """
         Converts position(row index & column index) in the grid to index in the flat representation of the grid.
@@ -34,3 +39,256 @@ def index_to_position(val, num_cols):
     """
 
     return int(val / num_cols), val % num_cols
+
+
+def sparse_probability(successors, probabilities, next_state, state, action):
+    """
+        Looks up the probability of transitioning between state and next_state with action in the sparse successor tables.
+        Sums the probabilities of all the entries of the state and action that lead to next_state, so that the
+        probability of a next state that is not a successor is 0.
+
+    :param successors: Sparse table of the next states of shape n_states * n_actions * n_successors
+    :param probabilities: Sparse table of the probabilities of shape n_states * n_actions * n_successors
+    :param next_state: Index of next state
+    :param state: Index of current state
+    :param action: Action to be taken
+    :return: Probability of transitioning between state and next_state with action
+    """
+
+    return probabilities[state, action][successors[state, action] == next_state].sum()
+
+
+def sparse_reward(successors, rewards, next_state, state, action):
+    """
+        Looks up the reward of transitioning between state and next_state with action in the sparse successor tables.
+        Returns the reward of the first entry of the state and action that leads to next_state, or 0 if next_state
+        is not a successor.
+
+    :param successors: Sparse table of the next states of shape n_states * n_actions * n_successors
+    :param rewards: Sparse table of the rewards of shape n_states * n_actions * n_successors
+    :param next_state: Index of next state
+    :param state: Index of current state
+    :param action: Action to be taken
+    :return: Reward for transitioning between state and next_state with action
+    """
+
+    reward = rewards[state, action][successors[state, action] == next_state]
+    return reward[0] if reward.size else 0.
+
+
+def model_memory(n_states, n_actions, n_successors):
+    """
+        Estimates the memory in bytes of the model of a grid environment for each representation, with the numeric
+        precision of the package (see set_precision()).
+            - on_the_fly: the grid and the distribution of starting states, the transitions of a state are calculated
+              when they are needed
+            - sparse: the sparse successor tables, and the sampling tables and expected rewards built from them
+              (see EnvironmentModel.get_sampling_tables() and EnvironmentModel.get_expected_rewards())
+            - dense: the sparse model and the dense probabilities and rewards of size n_states * n_states * n_actions
+
+    :param n_states: Number of states
+    :param n_actions: Number of actions
+    :param n_successors: Number of entries of the sparse successor tables for a state and action
+    :return: dictionary of representation: estimated bytes
+    """
+
+    float_size, index_size = np.dtype(float_dtype()).itemsize, np.dtype(index_dtype(n_states)).itemsize
+
+    on_the_fly = n_states * (np.dtype('<U1').itemsize + np.dtype(float).itemsize)
+    sparse = on_the_fly + n_states * n_actions * (n_successors * (index_size + 3 * float_size) + float_size)
+    dense = sparse + 2 * n_states * n_states * n_actions * float_size
+
+    return {'dense': dense, 'sparse': sparse, 'on_the_fly': on_the_fly}
+
+
+def select_representation(name, memory, memory_budget):
+    """
+        Selects the representation of the model that fits in the memory budget, in the order dense, sparse and
+        on_the_fly, and reports the choice.
+        Raises MemoryError if none of the representations fits, before any of the tables is allocated.
+
+    :param name: Name of the environment to report
+    :param memory: dictionary of representation: estimated bytes (see model_memory())
+    :param memory_budget: Memory budget of the model in bytes
+    :return: 'dense', 'sparse' or 'on_the_fly'
+    """
+
+    for representation in ('dense', 'sparse', 'on_the_fly'):
+        if memory[representation] <= memory_budget:
+            print('{}: {} model of {:.3g}MB selected for the memory budget of {:.3g}MB'.format(
+                name, representation, memory[representation] / 2 ** 20, memory_budget / 2 ** 20))
+            return representation
+
+    raise MemoryError('{} needs at least {:.3g}MB for the model computed on the fly, more than the memory budget of '
+                      '{:.3g}MB'.format(name, memory['on_the_fly'] / 2 ** 20, memory_budget / 2 ** 20))
+
+
+def move_indices(rows, columns, actions, indices=None):
+    """
+        Computes the index of the cell reached from every cell of the grid (or the cells at indices) for each of the
+        move directions at once.
+        A move that would leave the grid keeps the index of the cell itself.
+
+        Example: 2D array: [[0, 1],
+                            [2, 3]]
+                 actions: ((-1, 0), (1, 0), (0, -1), (0, 1))
+                 next indices: [[0, 2, 0, 1],
+                                [1, 3, 0, 1],
+                                [0, 2, 2, 3],
+                                [1, 3, 2, 3]]
+
+    :param rows: Number of rows in the 2D array/grid
+    :param columns: Number of columns in the 2D array/grid
+    :param actions: Tuple of (row, column) movements for each direction
+    :param indices: Array of the indices of the cells to be moved from, all the cells of the grid if None (optional)
+    :return: next indices and boolean mask of the moves that stay within the grid, both of shape
+             (number of cells, number of actions)
+    """
+
+    if indices is None:
+        x, y = np.indices((rows, columns)).reshape(2, -1, 1)
+    else:
+        x, y = np.divmod(np.asarray(indices).reshape(-1, 1), columns)
+    move_x, move_y = np.array(actions).T
+
+    next_x, next_y = x + move_x, y + move_y
+    inside = (0 <= next_x) & (next_x < rows) & (0 <= next_y) & (next_y < columns)
+
+    next_index = np.where(inside, position_to_index(next_x, next_y, columns), position_to_index(x, y, columns))
+
+    return next_index, inside
+
+
+def shift_grid(grid, move):
+    """
+        Shifts a 2D array by a move, so that every cell holds the value of the cell reached from it with the move.
+        A move that would leave the grid keeps the value of the cell itself, as in move_indices().
+
+        Example: 2D array: [[1, 2],
+                            [3, 4]]
+                 move: (1, 0) -> down
+                 shifted array: [[3, 4],
+                                 [3, 4]]
+
+    :param grid: 2D array of values of the cells of the grid
+    :param move: (row, column) movement
+    :return: shifted 2D array of the same shape as grid
+    """
+
+    (x, y), (rows, columns) = move, grid.shape
+
+    shifted = grid.copy()
+    shifted[max(-x, 0):rows - max(x, 0), max(-y, 0):columns - max(y, 0)] = \
+        grid[max(x, 0):rows + min(x, 0), max(y, 0):columns + min(y, 0)]
+
+    return shifted
+
+
+def generate_lake(rows, columns, hole_probability=0.1, seed=None):
+    """
+        Generates a random lake with the start at the top left and the goal at the bottom right of the grid.
+        Every other tile is a hole with hole_probability, else frozen.
+        The generated lake can also be used as a grid for GridWorld, with the holes as obstacles.
+
+    :param rows: Number of rows in the lake
+    :param columns: Number of columns in the lake
+    :param hole_probability: Probability of a tile being a hole
+    :param seed: A seed to control the random number generator (optional)
+    :return: lake as a list of lists
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    lake = np.where(random_state.uniform(0, 1, (rows, columns)) < hole_probability, '#', '.')
+    lake[0, 0] = '&'
+    lake[-1, -1] = '$'
+
+    return lake.tolist()
+
+
+def generate_maze(rows, columns, seed=None):
+    """
+        Generates a random maze with a randomized depth first search, with the start at the top left and the goal at
+        the bottom right of the grid. The cells at even row and column indices are connected by carving the wall
+        between them, so that every cell is reached from the start by exactly one path. Every other tile is a wall.
+        rows and columns should be odd, so that the bottom right tile is a cell.
+        The walls are holes of a lake, or obstacles of a grid for GridWorld.
+
+    :param rows: Number of rows in the maze
+    :param columns: Number of columns in the maze
+    :param seed: A seed to control the random number generator (optional)
+    :return: maze as a list of lists
+    """
+
+    random_state = np.random.RandomState(seed)
+    moves = ((-2, 0), (2, 0), (0, -2), (0, 2))
+
+    maze = np.full((rows, columns), '#')
+    maze[0, 0] = '.'
+    path = [(0, 0)]
+
+    while path:
+        x, y = path[-1]
+        neighbours = [(x + move_x, y + move_y) for move_x, move_y in moves
+                      if 0 <= x + move_x < rows and 0 <= y + move_y < columns and maze[x + move_x, y + move_y] == '#']
+
+        if neighbours:
+            next_x, next_y = neighbours[random_state.randint(len(neighbours))]
+            maze[(x + next_x) // 2, (y + next_y) // 2] = '.'
+            maze[next_x, next_y] = '.'
+            path.append((next_x, next_y))
+        else:
+            path.pop()
+
+    maze[0, 0] = '&'
+    maze[(rows - 1) // 2 * 2, (columns - 1) // 2 * 2] = '$'
+
+    return maze.tolist()
+
+
+def coarsen_lake(lake, block_size, hole_fraction=0.5):
+    """
+        Coarsens a lake by turning every block of block_size * block_size tiles into a single tile. Blocks at the
+        bottom and right edges of the lake may have less tiles.
+        A block is the goal if it contains the goal, else the start if it contains the start, else a hole if more
+        than hole_fraction of its tiles are holes, else frozen.
+
+    :param lake: A matrix that represents the lake
+    :param block_size: Number of rows and columns of the tiles of a block
+    :param hole_fraction: Fraction of holes above which a block is a hole (optional)
+    :return: coarse lake as a list of lists
+    """
+
+    lake = np.array(lake)
+    rows, columns = -(-lake.shape[0] // block_size), -(-lake.shape[1] // block_size)
+
+    padded = np.full((rows * block_size, columns * block_size), ' ')
+    padded[:lake.shape[0], :lake.shape[1]] = lake
+    blocks = padded.reshape(rows, block_size, columns, block_size).transpose(0, 2, 1, 3).reshape(rows, columns, -1)
+
+    holes = np.sum(blocks == '#', axis=2) / np.sum(blocks != ' ', axis=2)
+    coarse_lake = np.where(holes > hole_fraction, '#', '.')
+    coarse_lake[np.any(blocks == '&', axis=2)] = '&'
+    coarse_lake[np.any(blocks == '$', axis=2)] = '$'
+
+    return coarse_lake.tolist()
+
+
+def block_indices(rows, columns, block_size):
+    """
+        Computes the index of the tile of the coarse lake (see coarsen_lake()) of every tile of the lake, followed by
+        the index of the absorbing state of the coarse lake for the absorbing state of the lake.
+
+        Example: lake of 4 rows and 4 columns, block_size 2
+                 block indices: [0, 0, 1, 1, 0, 0, 1, 1, 2, 2, 3, 3, 2, 2, 3, 3, 4]
+
+    :param rows: Number of rows in the lake
+    :param columns: Number of columns in the lake
+    :param block_size: Number of rows and columns of the tiles of a block
+    :return: block indices as a numpy array of size rows * columns + 1
+    """
+
+    coarse_rows, coarse_columns = -(-rows // block_size), -(-columns // block_size)
+    x, y = np.divmod(np.arange(rows * columns), columns)
+
+    return np.append(position_to_index(x // block_size, y // block_size, coarse_columns), coarse_rows * coarse_columns)
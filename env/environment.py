@@ -25,8 +25,10 @@ class Environment(EnvironmentModel):
         if self.pi is None:
             self.pi = np.full(n_states, 1. / n_states)
 
+        self._cache_start_states()
+
         self.n_steps = 0
-        self.state = self.random_state.choice(self.n_states, p=self.pi)
+        self.state = self._draw_start_state()
 
     def reset(self):
         """
@@ -37,7 +39,7 @@ class Environment(EnvironmentModel):
         """
 
         self.n_steps = 0
-        self.state = self.random_state.choice(self.n_states, p=self.pi)
+        self.state = self._draw_start_state()
         return self.state
 
     def step(self, action):
@@ -111,6 +113,40 @@ class Environment(EnvironmentModel):
 
         raise NotImplementedError()
 
+    def get_sparse_prob_rewards(self):
+        """
+            Method to get the sparse successor tables of the probabilities and rewards for the env
+            raises NotImplementedError() if the method is not implemented by the super class
+
+        :return: successors, probabilities, rewards as numpy arrays of shape n_states * n_actions * n_successors
+        """
+
+        raise NotImplementedError()
+
+    def _cache_start_states(self):
+        """
+            Method to cache the possible starting states and their cumulative probabilities from the probability
+            distribution(pi) of starting states, to be called again when pi changes
+
+        :return: None
+        """
+
+        self._start_states = np.flatnonzero(self.pi)
+        self._start_cumulative_p = np.cumsum(self.pi[self._start_states])
+        self._start_cumulative_p /= self._start_cumulative_p[-1]
+
+    def _draw_start_state(self):
+        """
+            Method to draw a random starting state using the cumulative probabilities of the possible starting states,
+            cached from the probability distribution(pi) of starting states (see _cache_start_states()).
+            Draws the same state as numpy's choice() over all the states for the same random state.
+
+        :return: Starting state
+        """
+
+        i = self._start_cumulative_p.searchsorted(self.random_state.random_sample(), side='right')
+        return self._start_states[i]
+
     @contextlib.contextmanager
     def _printoptions(self, *args, **kwargs):
         """
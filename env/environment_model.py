@@ -2,6 +2,9 @@ import numpy as np
 
 
 class EnvironmentModel:
+    # Representation of the model of the environment, 'dense', 'sparse' or 'on_the_fly' (see model_memory())
+    representation = None
+
     def __init__(self, n_states, n_actions, seed=None):
         """
             Constructor for the Environment Model of the Reinforcement learning framework
@@ -16,6 +19,10 @@ class EnvironmentModel:
 
         self.random_state = np.random.RandomState(seed)
 
+        self._sampling_tables = None
+        self._expected_rewards = None
+        self._predecessors = None
+
     def p(self, next_state, state, action):
         """
             Method to calculate probability of transitioning between state and next_state with action
@@ -47,17 +54,150 @@ class EnvironmentModel:
     def draw(self, state, action):
         """
             Method to draw a next_state randomly based on probability of transitioning from state when action is chosen
+            Looks up the precomputed sampling tables (see get_sampling_tables()), so that a draw takes constant time
+            regardless of the number of states. Draws the same next states as numpy's choice() over all the states
+            for the same random state.
+            If the model is calculated on the fly, the successors of the state are calculated instead
+            (see get_successor_rows()), and the same next states are drawn as with the sampling tables.
+            Falls back to calculating the probabilities of all the next states with p() if the sparse successor
+            tables are not implemented
 
         :param state: Index of current state
         :param action: Action to be taken
         :return: next_state, reward
         """
 
-        p = [self.p(ns, state, action) for ns in range(self.n_states)]
-        next_state = self.random_state.choice(self.n_states, p=p)
-        reward = self.r(next_state, state, action)
+        if self.representation == 'on_the_fly':
+            successors, p, rewards = self.get_successor_rows(np.array([state]))
+            cumulative_p = np.cumsum(p[0, action])
+            cumulative_p /= cumulative_p[-1]
+
+            i = cumulative_p.searchsorted(self.random_state.random_sample(), side='right')
+
+            return successors[0, action, i], rewards[0, action, i]
+
+        try:
+            successors, cumulative_p, rewards = self.get_sampling_tables()
+        except NotImplementedError:
+            p = [self.p(ns, state, action) for ns in range(self.n_states)]
+            next_state = self.random_state.choice(self.n_states, p=p)
+            return next_state, self.r(next_state, state, action)
+
+        i = cumulative_p[state, action].searchsorted(self.random_state.random_sample(), side='right')
+
+        return successors[state, action, i], rewards[state, action, i]
+
+    def get_sampling_tables(self):
+        """
+            Method to get the tables for drawing next states, built once from the sparse successor tables
+            The cumulative probabilities of each state and action are normalized so that the last one is 1,
+            a next state is drawn by searching a uniform random number in them.
+            Raises NotImplementedError() if get_sparse_prob_rewards() is not implemented by the super class
+
+        :return: successors, cumulative probabilities, rewards as numpy arrays of shape n_states * n_actions * n_successors
+        """
+
+        if self._sampling_tables is None:
+            successors, p, r = self.get_sparse_prob_rewards()
+
+            cumulative_p = np.cumsum(p, axis=2)
+            cumulative_p /= cumulative_p[:, :, -1:]
+
+            self._sampling_tables = successors, cumulative_p, r
+
+        return self._sampling_tables
+
+    def get_expected_rewards(self):
+        """
+            Method to get the expected immediate reward of each state and action, built once from the sparse
+            successor tables
+                R(s, a) = Σs′ p(s′|s, a) r(s′, s, a)
+            Raises NotImplementedError() if get_sparse_prob_rewards() is not implemented by the super class
+
+        :return: expected rewards as a numpy array of shape n_states * n_actions
+        """
+
+        if self._expected_rewards is None:
+            _, p, r = self.get_sparse_prob_rewards()
+            self._expected_rewards = np.sum(p * r, axis=2)
+
+        return self._expected_rewards
+
+    def get_predecessors(self):
+        """
+            Method to get the predecessor index of the states, built once from the sparse successor tables
+            The predecessors of next_state are the states from which next_state is reached with a probability greater
+            than 0 by any action, stored in a compressed layout: predecessors[indptr[next_state]:indptr[next_state + 1]]
+            Raises NotImplementedError() if get_sparse_prob_rewards() is not implemented by the super class
+
+        :return: indptr of size n_states + 1, predecessors sorted by next state as numpy arrays
+        """
+
+        if self._predecessors is None:
+            successors, p, _ = self.get_sparse_prob_rewards()
+
+            states = np.broadcast_to(np.arange(self.n_states).reshape(-1, 1, 1), successors.shape)
+            edges = np.unique(successors[p > 0].astype(np.int64) * self.n_states + states[p > 0])
+
+            indptr = np.zeros(self.n_states + 1, dtype=int)
+            np.cumsum(np.bincount(edges // self.n_states, minlength=self.n_states), out=indptr[1:])
+
+            self._predecessors = indptr, edges % self.n_states
 
-        return next_state, reward
+        return self._predecessors
+
+    def _update_model(self, states):
+        """
+            Method to update the tables built from the sparse successor tables after the transitions or rewards of
+            some states changed, e.g. when tiles of the environment are changed
+            The rows of the states in the sampling tables and expected rewards are calculated again, while the
+            predecessor index is built again on the next call of get_predecessors()
+
+        :param states: Array of the states whose transitions or rewards changed
+        :return: None
+        """
+
+        _, p, r = self.get_sparse_prob_rewards()
+
+        if self._sampling_tables is not None:
+            _, cumulative_p, _ = self._sampling_tables
+            cumulative_p[states] = np.cumsum(p[states], axis=2)
+            cumulative_p[states] /= cumulative_p[states, :, -1:]
+
+        if self._expected_rewards is not None:
+            self._expected_rewards[states] = np.sum(p[states] * r[states], axis=2)
+
+        self._predecessors = None
+
+    def get_successor_rows(self, states):
+        """
+            Method to get the rows of the sparse successor tables of states, selected from get_sparse_prob_rewards()
+            Subclasses calculate the rows instead if the model is calculated on the fly
+            Raises NotImplementedError() if get_sparse_prob_rewards() is not implemented by the super class
+
+        :param states: Array of states
+        :return: successors, probabilities, rewards as numpy arrays of shape number of states * n_actions *
+                 n_successors
+        """
+
+        successors, p, r = self.get_sparse_prob_rewards()
+
+        return successors[states], p[states], r[states]
+
+    def get_action_values(self, value, gamma):
+        """
+            Method to calculate the values of all actions of all states for a value array directly from the dynamics
+            of the environment, without the probabilities and rewards, for a model calculated on the fly
+                Q(s, a) = R(s, a) + γ Σs′ p(s′|s, a) V(s′)
+            To be implemented by subclasses
+            Raises NotImplementedError() if get_action_values() is not implemented
+
+        :param value: Value array
+        :param gamma: Parameter to decay the future rewards
+        :return: action values as a numpy array of shape n_states * n_actions
+        """
+
+        raise NotImplementedError()
 
     def get_prob_rewards(self):
         """
@@ -68,3 +208,13 @@ class EnvironmentModel:
         """
 
         raise NotImplementedError()
+
+    def get_sparse_prob_rewards(self):
+        """
+            Method to get the sparse successor tables of the probabilities and rewards for the env
+            raises NotImplementedError() if the method is not implemented by the super class
+
+        :return: successors, probabilities, rewards as numpy arrays of shape n_states * n_actions * n_successors
+        """
+
+        raise NotImplementedError()
@@ -1,11 +1,13 @@
 import numpy as np
 
-from env.env_helper import index_to_position, position_to_index
+from env.env_helper import index_to_position, model_memory, move_indices, position_to_index, \
+    select_representation, shift_grid, sparse_probability, sparse_reward
 from env.environment import Environment
+from env.precision import float_dtype, index_dtype
 
 
 class FrozenLake(Environment):
-    def __init__(self, lake, slip, max_steps, seed=None):
+    def __init__(self, lake, slip, max_steps, seed=None, sparse=False, memory_budget=None, representation=None):
         """
             Constructor for the Frozen lake environment that inherits the class Environment
             1. initialization
@@ -26,6 +28,15 @@ class FrozenLake(Environment):
                      [0.95  0.025 0.    0.    0.025 0.    0.    0.    0.    0.    0.    0.  0.    0.    0.    0.    0.]
                      [0.05  0.925 0.    0.    0.025 0.    0.    0.    0.    0.    0.    0.  0.    0.    0.    0.    0.]]
                 - call the function_populate_probabilities() to load the precomputed probabilities in the 3D array
+                - create 3D arrays of size n_states * n_actions * n_actions to store the sparse successor tables,
+                  i.e, for each state and action the next states that can be reached, their probabilities and rewards
+                  The dense 3D arrays are not created when sparse is True, so that big lakes fit in memory
+                - the probabilities and rewards are stored with the numeric precision of the package
+                  (see set_precision())
+                - if a memory budget is given, the representation of the model is selected automatically from the
+                  estimated memory of each representation (see model_memory() and select_representation()):
+                  dense and sparse tables, only the sparse tables, or no tables at all when the successors of a state
+                  are calculated on the fly every time they are needed (see get_successor_rows())
 
         :param lake: A matrix that represents the lake.
                 Example:
@@ -40,6 +51,12 @@ class FrozenLake(Environment):
         :param slip: The probability that the agent will slip
         :param max_steps: The maximum number of time steps in an episode
         :param seed: A seed to control the random number generator (optional)
+        :param sparse: If True, only the sparse successor tables are created for the model (optional)
+        :param memory_budget: Memory budget of the model in bytes, selects the representation of the model instead
+                              of sparse and representation if given. Raises MemoryError if no representation fits
+                              (optional)
+        :param representation: 'dense', 'sparse' or 'on_the_fly', representation of the model instead of sparse if
+                               given (optional)
         """
 
         self.lake = np.array(lake)
@@ -50,6 +67,17 @@ class FrozenLake(Environment):
         n_states = self.lake.size + 1
         n_actions = len(self.actions)
 
+        if memory_budget is None and representation is None:
+            self.representation = 'sparse' if sparse else 'dense'
+        elif memory_budget is None:
+            if representation not in ('dense', 'sparse', 'on_the_fly'):
+                raise Exception('Invalid Representation!!!')
+            self.representation = representation
+        else:
+            self.representation = select_representation('FrozenLake', model_memory(n_states, n_actions, n_actions),
+                                                         memory_budget)
+        self.sparse = self.representation != 'dense'
+
         self.absorbing_state = n_states - 1
 
         pi = np.zeros(n_states, dtype=float)
@@ -57,11 +85,16 @@ class FrozenLake(Environment):
 
         super(FrozenLake, self).__init__(n_states, n_actions, max_steps, pi, seed)
 
-        self._p = np.zeros((self.n_states, self.n_states, self.n_actions), dtype=float)
-        self._r = np.zeros_like(self._p)
+        if self.representation != 'on_the_fly':
+            self._populate_successors()
+            self._populate_successor_rewards()
+
+        if not self.sparse:
+            self._p = np.zeros((self.n_states, self.n_states, self.n_actions), dtype=float_dtype())
+            self._r = np.zeros_like(self._p)
 
-        self._populate_probabilities()
-        self._populate_rewards()
+            self._populate_probabilities()
+            self._populate_rewards()
 
     def p(self, next_state, state, action):
         """
@@ -73,6 +106,13 @@ class FrozenLake(Environment):
         :return: Probability of transitioning between state and next_state with action
         """
 
+        if self.representation == 'on_the_fly':
+            successors, p, _ = self.get_successor_rows(np.array([state]))
+            return sparse_probability(successors, p, next_state, 0, action)
+
+        if self.sparse:
+            return sparse_probability(self._successors, self._successor_p, next_state, state, action)
+
         return self._p[state, next_state, action]
 
     def r(self, next_state, state, action):
@@ -85,6 +125,13 @@ class FrozenLake(Environment):
         :return: Reward for transitioning between state and next_state with action
         """
 
+        if self.representation == 'on_the_fly':
+            successors, _, r = self.get_successor_rows(np.array([state]))
+            return sparse_reward(successors, r, next_state, 0, action)
+
+        if self.sparse:
+            return sparse_reward(self._successors, self._successor_r, next_state, state, action)
+
         return self._r[state, next_state, action]
 
     def step(self, action):
@@ -104,12 +151,82 @@ class FrozenLake(Environment):
     def get_prob_rewards(self):
         """
             Method to get the probabilities and rewards for the env.
+            Raises RuntimeError if the env was created with sparse=True, use get_sparse_prob_rewards() instead
 
         :return: probabilities, rewards as numpy arrays
         """
 
+        if self.sparse:
+            raise RuntimeError('Dense probabilities and rewards are not created for a {} FrozenLake'.format(
+                self.representation))
+
         return self._p, self._r
 
+    def get_sparse_prob_rewards(self):
+        """
+            Method to get the sparse successor tables for the env.
+            Each table has the shape n_states * n_actions * n_actions, for a state and action
+            successors[state, action] holds the next states sorted by index, and probabilities[state, action] and
+            rewards[state, action] hold the probability and reward for transitioning to each of them.
+            Unused entries are padded with the state itself and a probability of 0
+            Raises RuntimeError if the model is calculated on the fly, use get_successor_rows() instead
+
+        :return: successors, probabilities, rewards as numpy arrays
+        """
+
+        if self.representation == 'on_the_fly':
+            raise RuntimeError('Sparse successor tables are not created for an on_the_fly FrozenLake')
+
+        return self._successors, self._successor_p, self._successor_r
+
+    def get_successor_rows(self, states):
+        """
+            Method to get the rows of the sparse successor tables of states, calculated from the lake if the model is
+            calculated on the fly (see _calculate_successors() and _calculate_successor_rewards())
+
+        :param states: Array of states
+        :return: successors, probabilities, rewards as numpy arrays of shape number of states * n_actions * n_actions
+        """
+
+        if self.representation != 'on_the_fly':
+            return super(FrozenLake, self).get_successor_rows(states)
+
+        states = np.asarray(states)
+        return (*self._calculate_successors(states), self._calculate_successor_rewards(states))
+
+    def get_action_values(self, value, gamma):
+        """
+            Method to calculate the values of all actions of all states for a value array with stencil operations on
+            the lake, without the probabilities and rewards, so that the memory is of the order of the size of the lake
+            Algorithm:
+                1. reshape the values of the tiles to the shape of the lake
+                2. shift the values by each move direction, so that every tile holds the value of the tile reached by
+                   the move (see shift_grid())
+                3. for all the tiles and actions at once, the value of an action is the value reached by the action
+                   with probability 1 - slip, plus the mean of the values reached by all move directions with
+                   probability slip
+                    Q(s, a) = γ [(1 - slip) V(s_a) + slip / n_actions Σd V(s_d)]
+                4. for the absorbing state, holes and goals, the value of all actions is the value of the absorbing
+                   state, and the reward 1 is added for the goals
+
+        :param value: Value array
+        :param gamma: Parameter to decay the future rewards
+        :return: action values as a numpy array of shape n_states * n_actions
+        """
+
+        grid = value[:-1].reshape(self.lake.shape)
+        moved = np.stack([shift_grid(grid, move) for move in self.actions], axis=-1).reshape(-1, self.n_actions)
+
+        action_values = np.empty((self.n_states, self.n_actions), dtype=value.dtype)
+        action_values[:-1] = gamma * (((1 - self.slip) * moved) +
+                                      ((self.slip / self.n_actions) * np.sum(moved, axis=1, keepdims=True)))
+
+        lake = self.lake.reshape(-1)
+        action_values[np.append(np.isin(lake, ('#', '$')), True)] = gamma * value[self.absorbing_state]
+        action_values[np.flatnonzero(lake == '$')] += 1
+
+        return action_values
+
     def render(self, policy=None, value=None):
         """
             Method to visualize the FrozenLake
@@ -142,60 +259,229 @@ class FrozenLake(Environment):
             with self._printoptions(precision=3, suppress=True):
                 print(value[:-1].reshape(self.lake.shape))
 
-    def _populate_probabilities(self):
+    def set_tiles(self, tiles):
+        """
+            Method to change tiles of the lake, e.g. holes appearing or the goal moving, and update the model in place
+            A tile only changes the transitions and rewards from its own state, so only the entries of the states of
+            the changed tiles are calculated again, the tables built from the model are updated
+            (see EnvironmentModel._update_model()) and the distribution(pi) of starting states is calculated again
+            if a starting tile changed
+            Throws an exception if any of the tiles is not valid or no starting tile is left
+
+        :param tiles: dictionary of (row, column) position: tile, e.g. {(2, 3): '#', (7, 7): '.', (6, 7): '$'}
+        :return: Array of the states whose transitions or rewards changed
+        """
+
+        if any(tile not in ('&', '.', '#', '$') for tile in tiles.values()):
+            raise Exception('Invalid Tile!!!')
+
+        states = np.unique([position_to_index(x, y, self.columns) for x, y in tiles])
+        starts_changed = '&' in tiles.values() or np.any(self.lake.reshape(-1)[states] == '&')
+
+        lake = self.lake.copy()
+        for position, tile in tiles.items():
+            lake[position] = tile
+
+        if not np.any(lake == '&'):
+            raise Exception('Invalid Tile!!! The lake must keep a starting tile')
+
+        self.lake = lake
+
+        if self.representation != 'on_the_fly':
+            self._populate_successors(states)
+            self._populate_successor_rewards(states)
+
+        if not self.sparse:
+            self._p[states] = 0
+            self._r[states] = 0
+            self._populate_probabilities(states)
+            self._populate_rewards(states)
+
+        if starts_changed:
+            self.pi = np.zeros(self.n_states, dtype=float)
+            self.pi[np.where(self.lake.reshape(-1) == '&')[0]] = 1.0
+            self._cache_start_states()
+
+        if self.representation != 'on_the_fly':
+            self._update_model(states)
+
+        return states
+
+    def _tiles(self, states):
+        """
+            Method to look up the tiles of states in the lake, without going through the whole lake
+
+        :param states: Array of states
+        :return: Array of the tiles of the states, ' ' for the absorbing state
+        """
+
+        tiles = np.full(states.size, ' ')
+        cells = states < self.lake.size
+        tiles[cells] = self.lake.reshape(-1)[states[cells]]
+
+        return tiles
+
+    def _sink_states(self, states):
+        """
+            Method to mask the states from which the only successor is the absorbing state,
+            i.e, the holes, the goals and the absorbing state itself
+
+        :param states: Array of states
+        :return: boolean array of the same size as states
+        """
+
+        return np.isin(self._tiles(states), ('#', '$', ' '))
+
+    def _populate_probabilities(self, states=None):
         """
             Method to calculate probability of transitioning between state and next_state with action
+            Computed with whole grid numpy operations instead of a loop over the states
             Algorithm:
-                1. for each state do the steps below
-                2. calculate row and column indices for the state
-                3. if the state is an absorbing state or a hole or goal, then probability of transitioning to the absorbing state is 1
-                   and go back to step 1
-                4. for every possible action (up, down, left, right), go to step 5
-                5. for slippage in each action
-                                - assign the current state to the next state
-                                - allocate the x,y coordinate of the next state by adding the movements to the direction,
+                1. calculate the next state of every cell for each move direction (up, down, left, right),
+                   moves that would leave the grid stay where you are (see move_indices())
                                                         add (0 to the x coordinate, +1 to y coordinate)
                                                                              ↑
                     add (-1 to the x coordinate, 0 to y coordinate) ← current_state → add (+1 to the x coordinate, 0 to y coordinate)
                                                                              ↓
                                                         add (0 to the x coordinate, -1 to y coordinate)
-                                - if the next state is within the grid, then make the next move, else stay where you are
+                2. mask the cells that are neither a hole nor a goal
+                3. for slippage in each move direction, for all the masked cells and all actions at once
                                 - assign uniform probability distribution of slippage for transitioning from current state to next state with the slippage action
                                  (example, 0.025 (0.1/4) in this scenario)
-                                - if the action and slip action are same, then it means the position has not changed, hence the probability is 1-slip,
+                                - if the action and slip action are same, add 1-slip to the probability,
                                  (example, if slippage is 0.1, then no action from current position results in probability of 0.9)
                                  Assigning higher probability to continue to move in the same direction
+                4. for the absorbing state, holes and goals, the probability of transitioning to the absorbing state is 1
+
+        :param states: Array of the states to be calculated, all the states if None (optional)
         :return: None
         """
 
-        for state in range(self.n_states):
-            x, y = index_to_position(state, self.columns)
+        states = np.arange(self.n_states) if states is None else np.asarray(states)
+        sinks = self._sink_states(states)
+        cells = states[~sinks]
+        next_states, _ = move_indices(self.rows, self.columns, self.actions, cells)
 
-            if state == self.absorbing_state or self.lake[x, y] in ('#', '$'):
-                self._p[state, self.absorbing_state, :] = 1
-                continue
+        all_actions = np.arange(self.n_actions)
+        for slip_action in range(self.n_actions):
+            self._p[cells.reshape(-1, 1), next_states[:, [slip_action]], all_actions] += self.slip / self.n_actions
+            self._p[cells, next_states[:, slip_action], slip_action] += 1 - self.slip
 
-            for action in range(self.n_actions):
-                for slip_action in range(self.n_actions):
-                    next_state = state
-                    next_x, next_y = x + self.actions[slip_action][0], y + self.actions[slip_action][1]
-                    if 0 <= next_x < self.rows and 0 <= next_y < self.columns:
-                        next_state = position_to_index(next_x, next_y, self.columns)
+        self._p[states[sinks], self.absorbing_state, :] = 1
 
-                    self._p[state, next_state, action] += self.slip / self.n_actions
-                    if action == slip_action:
-                        self._p[state, next_state, action] += 1 - self.slip
-
-    def _populate_rewards(self):
+    def _populate_rewards(self, states=None):
         """
             Method to calculate reward of transitioning between state and next_state with action
             Algorithm:
-                1. for each state do the steps below
-                2. if the state is a goal state, set the reward for state to absorbing_state for all actions as 1.
+                1. mask the goal states of the lake
+                2. set the reward for the goal states to absorbing_state for all actions as 1.
 
+        :param states: Array of the states to be calculated, all the states if None (optional)
         :return: None
         """
 
-        for state in range(self.n_states):
-            if state != self.absorbing_state and self.lake[index_to_position(state, self.columns)] == '$':
-                self._r[state, self.absorbing_state, :] = 1
+        self._r[self._goal_states(states), self.absorbing_state, :] = 1
+
+    def _populate_successors(self, states=None):
+        """
+            Method to calculate the sparse successor tables of transitioning between state and next_state with action
+            (see _calculate_successors())
+
+        :param states: Array of the states to be calculated, all the states if None (optional)
+        :return: None
+        """
+
+        if states is None:
+            self._successors, self._successor_p = self._calculate_successors(np.arange(self.n_states))
+        else:
+            self._successors[states], self._successor_p[states] = self._calculate_successors(np.asarray(states))
+
+    def _populate_successor_rewards(self, states=None):
+        """
+            Method to calculate the sparse reward table of transitioning between state and next_state with action
+            (see _calculate_successor_rewards())
+
+        :param states: Array of the states to be calculated, all the states if None (optional)
+        :return: None
+        """
+
+        if states is None:
+            self._successor_r = self._calculate_successor_rewards(np.arange(self.n_states))
+        else:
+            self._successor_r[states] = self._calculate_successor_rewards(np.asarray(states))
+
+    def _calculate_successors(self, states):
+        """
+            Method to calculate the rows of the sparse successor tables of states
+            Computed with whole grid numpy operations instead of a loop over the states
+            Algorithm:
+                1. calculate the next state of every cell for each move direction as in _populate_probabilities()
+                2. for each move direction, find the first move direction that reaches the same next state,
+                   the entry of that move direction accumulates the probabilities of both
+                3. for slippage in each move direction, accumulate the probability of the next state for all the
+                   states and actions at once in the same order as _populate_probabilities()
+                4. sort the entries of each state by next state, moving the entries of repeated next states to the end
+                   as padding with the state itself and a probability of 0
+                5. for the absorbing state, holes and goals, the only successor is the absorbing state with probability 1
+
+        :param states: Array of states
+        :return: successors, probabilities as numpy arrays of shape number of states * n_actions * n_actions
+        """
+
+        successors = np.zeros((states.size, self.n_actions, self.n_actions), dtype=index_dtype(self.n_states))
+        successor_p = np.zeros(successors.shape, dtype=float_dtype())
+
+        is_cell = states < self.lake.size
+        cells = states[is_cell]
+        next_states, _ = move_indices(self.rows, self.columns, self.actions, cells)
+        rows = np.arange(cells.size)
+
+        first_entry = np.argmax(next_states[:, :, np.newaxis] == next_states[:, np.newaxis, :], axis=2)
+        repeated = first_entry != np.arange(self.n_actions)
+
+        probabilities = np.zeros((cells.size, self.n_actions, self.n_actions), dtype=float)
+        for slip_action in range(self.n_actions):
+            entry = first_entry[:, [slip_action]]
+            probabilities[rows.reshape(-1, 1), :, entry] += self.slip / self.n_actions
+            probabilities[rows, slip_action, entry[:, 0]] += 1 - self.slip
+
+        order = np.argsort(np.where(repeated, self.n_states, next_states), axis=1, kind='stable')
+        next_states = np.where(repeated, cells.reshape(-1, 1), next_states)
+
+        successors[is_cell] = np.take_along_axis(next_states, order, axis=1)[:, np.newaxis, :]
+        successor_p[is_cell] = np.take_along_axis(probabilities, order[:, np.newaxis, :], axis=2)
+
+        sinks = self._sink_states(states)
+        successors[sinks] = states[sinks].reshape(-1, 1, 1)
+        successors[sinks, :, 0] = self.absorbing_state
+        successor_p[sinks] = 0
+        successor_p[sinks, :, 0] = 1
+
+        return successors, successor_p
+
+    def _calculate_successor_rewards(self, states):
+        """
+            Method to calculate the rows of the sparse reward table of states
+            Algorithm:
+                1. mask the goal states among states
+                2. set the reward for the goal states to absorbing_state for all actions as 1.
+
+        :param states: Array of states
+        :return: rewards as a numpy array of shape number of states * n_actions * n_actions
+        """
+
+        rewards = np.zeros((states.size, self.n_actions, self.n_actions), dtype=float_dtype())
+        rewards[self._tiles(states) == '$', :, 0] = 1
+
+        return rewards
+
+    def _goal_states(self, states=None):
+        """
+            Method to find the goal states of the lake among states
+
+        :param states: Array of states, all the states if None (optional)
+        :return: Array of the goal states
+        """
+
+        goals = np.flatnonzero(self.lake.reshape(-1) == '$')
+        return goals if states is None else np.intersect1d(goals, states)
@@ -1,12 +1,23 @@
 import numpy as np
 
-from env.env_helper import position_to_index, index_to_position
+from env.env_helper import index_to_position, model_memory, move_indices, position_to_index, \
+    select_representation, shift_grid, sparse_probability, sparse_reward
 from env.environment import Environment
+from env.precision import float_dtype, index_dtype
 
 
 class GridWorld(Environment):
-    def __init__(self, grid, max_steps, seed=None):
+    def __init__(self, grid, max_steps, seed=None, sparse=False, memory_budget=None, representation=None):
         """
+            Constructor for the GridWorld environment that inherits the class Environment
+            The dense probabilities and rewards of size n_states * n_states * n_actions are not created when sparse
+            is True, only the sparse successor tables of size n_states * n_actions * 1 as every move is deterministic
+            The probabilities and rewards are stored with the numeric precision of the package (see set_precision())
+            If a memory budget is given, the representation of the model is selected automatically from the estimated
+            memory of each representation (see model_memory() and select_representation()): dense and sparse tables,
+            only the sparse tables, or no tables at all when the successors of a state are calculated on the fly every
+            time they are needed (see get_successor_rows())
+
         :param grid: A matrix that represents the grid world
                 Example:
                     grid = [['&', '.', '.', '.'],
@@ -20,6 +31,12 @@ class GridWorld(Environment):
                     $ -> Positive reward (+1)
         :param max_steps: The maximum number of time steps in an episode
         :param seed: A seed to control the random number generator (optional)
+        :param sparse: If True, only the sparse successor tables are created for the model (optional)
+        :param memory_budget: Memory budget of the model in bytes, selects the representation of the model instead
+                              of sparse and representation if given. Raises MemoryError if no representation fits
+                              (optional)
+        :param representation: 'dense', 'sparse' or 'on_the_fly', representation of the model instead of sparse if
+                               given (optional)
         """
 
         self.world = np.array(grid)
@@ -30,6 +47,17 @@ class GridWorld(Environment):
 
         self.actions = ((-1, 0), (1, 0), (0, -1), (0, 1))
 
+        if memory_budget is None and representation is None:
+            self.representation = 'sparse' if sparse else 'dense'
+        elif memory_budget is None:
+            if representation not in ('dense', 'sparse', 'on_the_fly'):
+                raise Exception('Invalid Representation!!!')
+            self.representation = representation
+        else:
+            self.representation = select_representation('GridWorld', model_memory(n_states, n_actions, 1),
+                                                         memory_budget)
+        self.sparse = self.representation != 'dense'
+
         self.absorbing_state = n_states - 1
 
         pi = np.zeros(n_states, dtype=float)
@@ -37,11 +65,16 @@ class GridWorld(Environment):
 
         super(GridWorld, self).__init__(n_states, n_actions, max_steps, pi, seed)
 
-        self._p = np.zeros((self.n_states, self.n_states, self.n_actions), dtype=float)
-        self._r = np.zeros_like(self._p)
+        if self.representation != 'on_the_fly':
+            self._populate_successors()
+            self._populate_successor_rewards()
+
+        if not self.sparse:
+            self._p = np.zeros((self.n_states, self.n_states, self.n_actions), dtype=float_dtype())
+            self._r = np.zeros_like(self._p)
 
-        self._populate_probabilities()
-        self._populate_rewards()
+            self._populate_probabilities()
+            self._populate_rewards()
 
     def p(self, next_state, state, action):
         """
@@ -53,6 +86,13 @@ class GridWorld(Environment):
         :return: Probability of transitioning between state and next_state with action
         """
 
+        if self.representation == 'on_the_fly':
+            successors, p, _ = self.get_successor_rows(np.array([state]))
+            return sparse_probability(successors, p, next_state, 0, action)
+
+        if self.sparse:
+            return sparse_probability(self._successors, self._successor_p, next_state, state, action)
+
         return self._p[state, next_state, action]
 
     def r(self, next_state, state, action):
@@ -65,6 +105,13 @@ class GridWorld(Environment):
         :return: Reward for transitioning between state and next_state with action
         """
 
+        if self.representation == 'on_the_fly':
+            successors, _, r = self.get_successor_rows(np.array([state]))
+            return sparse_reward(successors, r, next_state, 0, action)
+
+        if self.sparse:
+            return sparse_reward(self._successors, self._successor_r, next_state, state, action)
+
         return self._r[state, next_state, action]
 
     def step(self, action):
@@ -84,12 +131,83 @@ class GridWorld(Environment):
     def get_prob_rewards(self):
         """
             Method to get the probabilities and rewards for the env.
+            Raises RuntimeError if the env was created with sparse=True, use get_sparse_prob_rewards() instead
 
         :return: probabilities, rewards as numpy arrays
         """
 
+        if self.sparse:
+            raise RuntimeError('Dense probabilities and rewards are not created for a {} GridWorld'.format(
+                self.representation))
+
         return self._p, self._r
 
+    def get_sparse_prob_rewards(self):
+        """
+            Method to get the sparse successor tables for the env.
+            Each table has the shape n_states * n_actions * 1, for a state and action successors[state, action]
+            holds the next state, and probabilities[state, action] and rewards[state, action] hold the probability
+            and reward for transitioning to it.
+            Raises RuntimeError if the model is calculated on the fly, use get_successor_rows() instead
+
+        :return: successors, probabilities, rewards as numpy arrays
+        """
+
+        if self.representation == 'on_the_fly':
+            raise RuntimeError('Sparse successor tables are not created for an on_the_fly GridWorld')
+
+        return self._successors, self._successor_p, self._successor_r
+
+    def get_successor_rows(self, states):
+        """
+            Method to get the rows of the sparse successor tables of states, calculated from the world if the model
+            is calculated on the fly (see _calculate_successors() and _calculate_successor_rewards())
+
+        :param states: Array of states
+        :return: successors, probabilities, rewards as numpy arrays of shape number of states * n_actions * 1
+        """
+
+        if self.representation != 'on_the_fly':
+            return super(GridWorld, self).get_successor_rows(states)
+
+        states = np.asarray(states)
+        return (*self._calculate_successors(states), self._calculate_successor_rewards(states))
+
+    def get_action_values(self, value, gamma):
+        """
+            Method to calculate the values of all actions of all states for a value array with stencil operations on
+            the world, without the probabilities and rewards, so that the memory is of the order of the size of the
+            world
+            Algorithm:
+                1. reshape the values of the cells to the shape of the world
+                2. shift the values by each move direction, so that every cell holds the value of the cell reached by
+                   the move (see shift_grid()), moves that start from or end in an obstacle keep the value of the cell
+                3. the value of an action is the value reached by the action
+                    Q(s, a) = γ V(s_a)
+                4. for the absorbing state, goal states and negative reward states, the value of all actions is the
+                   value of the absorbing state, and the reward 1 is added for the goal states and -1 for the negative
+                   reward states
+
+        :param value: Value array
+        :param gamma: Parameter to decay the future rewards
+        :return: action values as a numpy array of shape n_states * n_actions
+        """
+
+        grid = value[:-1].reshape(self.world.shape)
+        obstacles = self.world == '#'
+        moved = np.stack([np.where(shift_grid(obstacles, move) | obstacles, grid, shift_grid(grid, move))
+                          for move in self.actions], axis=-1).reshape(-1, self.n_actions)
+
+        action_values = np.empty((self.n_states, self.n_actions), dtype=value.dtype)
+        action_values[:-1] = gamma * moved
+
+        world = self.world.reshape(-1)
+        action_values[np.append(np.isin(world, ('£', '$')), True)] = gamma * value[self.absorbing_state]
+        action_values[np.flatnonzero(world == '$')] += 1
+        action_values[np.flatnonzero(world == '£')] -= 1
+
+        return action_values
+
     def render(self, policy=None, value=None):
         """
             Method to visualize the GridWorld
@@ -119,49 +237,205 @@ class GridWorld(Environment):
             with self._printoptions(precision=3, suppress=True):
                 print(value[:-1].reshape(self.world.shape))
 
-    def _populate_probabilities(self):
+    def set_tiles(self, tiles):
+        """
+            Method to change tiles of the world, e.g. obstacles appearing or the goal moving, and update the model in
+            place
+            A tile only changes the transitions and rewards from its own state and the moves of its neighbours into it,
+            so only the entries of the states of the changed tiles and their neighbours are calculated again, the
+            tables built from the model are updated (see EnvironmentModel._update_model()) and the distribution(pi) of
+            starting states is calculated again if a starting tile changed
+            Throws an exception if any of the tiles is not valid or no starting tile is left
+
+        :param tiles: dictionary of (row, column) position: tile, e.g. {(2, 3): '#', (3, 3): '.', (0, 3): '$'}
+        :return: Array of the states whose transitions or rewards changed
+        """
+
+        if any(tile not in ('&', '.', '#', '£', '$') for tile in tiles.values()):
+            raise Exception('Invalid Tile!!!')
+
+        tile_states = np.unique([position_to_index(x, y, self.columns) for x, y in tiles])
+        starts_changed = '&' in tiles.values() or np.any(self.world.reshape(-1)[tile_states] == '&')
+
+        world = self.world.copy()
+        for position, tile in tiles.items():
+            world[position] = tile
+
+        if not np.any(world == '&'):
+            raise Exception('Invalid Tile!!! The world must keep a starting tile')
+
+        self.world = world
+
+        neighbours, _ = move_indices(self.rows, self.columns, self.actions, tile_states)
+        states = np.union1d(tile_states, neighbours)
+
+        if self.representation != 'on_the_fly':
+            self._populate_successors(states)
+            self._populate_successor_rewards(states)
+
+        if not self.sparse:
+            self._p[states] = 0
+            self._r[states] = 0
+            self._populate_probabilities(states)
+            self._populate_rewards(states)
+
+        if starts_changed:
+            self.pi = np.zeros(self.n_states, dtype=float)
+            self.pi[np.where(self.world.reshape(-1) == '&')[0]] = 1.0
+            self._cache_start_states()
+
+        if self.representation != 'on_the_fly':
+            self._update_model(states)
+
+        return states
+
+    def _populate_probabilities(self, states=None):
         """
             Method to calculate probability of transitioning between state and next_state with action
             Algorithm:
-                1. for each state do the steps below
-                2. calculate row and column indices for the state
-                3. if the state is an absorbing state or a goal state, then probability of transitioning to the absorbing state is 1
-                   and go back to step 1
-                4. for every possible action (up, down, left, right), go to step 5
-                5. find the next state and store the probability of transitioning from state to next state using action as 1.
+                1. find the next state of every state for every action at once (see _next_states())
+                2. store the probability of transitioning from state to next state using action as 1.
 
+        :param states: Array of the states to be calculated, all the states if None (optional)
         :return: None
         """
 
-        for state in range(self.n_states):
-            x, y = index_to_position(state, self.columns)
-
-            if state == self.absorbing_state or self.world[x, y] in ('£', '$'):
-                self._p[state, self.absorbing_state, :] = 1
-                continue
-
-            for action in range(self.n_actions):
-                next_state = state
-                next_x, next_y = x + self.actions[action][0], y + self.actions[action][1]
-                if 0 <= next_x < self.rows and 0 <= next_y < self.columns and self.world[next_x, next_y] != '#' and \
-                        self.world[x, y] != '#':
-                    next_state = position_to_index(next_x, next_y, self.columns)
+        states = np.arange(self.n_states) if states is None else np.asarray(states)
+        next_states = self._next_states(states)
 
-                self._p[state, next_state, action] = 1
+        self._p[states.reshape(-1, 1), next_states, np.arange(self.n_actions)] = 1
 
-    def _populate_rewards(self):
+    def _populate_rewards(self, states=None):
         """
             Method to calculate reward of transitioning between state and next_state with action
             Algorithm:
-                1. for each state do the steps below
-                2. if the state is a goal state, set the reward for state to absorbing_state for all actions as 1.
+                1. mask the goal states and the negative reward states of the world
+                2. set the reward for the goal states to absorbing_state for all actions as 1,
+                   and for the negative reward states as -1.
 
+        :param states: Array of the states to be calculated, all the states if None (optional)
         :return: None
         """
 
-        for state in range(self.n_states):
-            if state != self.absorbing_state:
-                if self.world[index_to_position(state, self.columns)] == '$':
-                    self._r[state, self.absorbing_state, :] = 1
-                elif self.world[index_to_position(state, self.columns)] == '£':
-                    self._r[state, self.absorbing_state, :] = -1
+        goals, negative_rewards = self._reward_states(states)
+
+        self._r[goals, self.absorbing_state, :] = 1
+        self._r[negative_rewards, self.absorbing_state, :] = -1
+
+    def _populate_successors(self, states=None):
+        """
+            Method to calculate the sparse successor tables of transitioning between state and next_state with action
+            (see _calculate_successors())
+
+        :param states: Array of the states to be calculated, all the states if None (optional)
+        :return: None
+        """
+
+        if states is None:
+            self._successors, self._successor_p = self._calculate_successors(np.arange(self.n_states))
+        else:
+            self._successors[states], self._successor_p[states] = self._calculate_successors(np.asarray(states))
+
+    def _populate_successor_rewards(self, states=None):
+        """
+            Method to calculate the sparse reward table of transitioning between state and next_state with action
+            (see _calculate_successor_rewards())
+
+        :param states: Array of the states to be calculated, all the states if None (optional)
+        :return: None
+        """
+
+        if states is None:
+            self._successor_r = self._calculate_successor_rewards(np.arange(self.n_states))
+        else:
+            self._successor_r[states] = self._calculate_successor_rewards(np.asarray(states))
+
+    def _calculate_successors(self, states):
+        """
+            Method to calculate the rows of the sparse successor tables of states
+            Algorithm:
+                1. find the next state of every state for every action at once (see _next_states())
+                2. store it as the only successor with probability 1.
+
+        :param states: Array of states
+        :return: successors, probabilities as numpy arrays of shape number of states * n_actions * 1
+        """
+
+        successors = self._next_states(states)[:, :, np.newaxis].astype(index_dtype(self.n_states))
+
+        return successors, np.ones(successors.shape, dtype=float_dtype())
+
+    def _calculate_successor_rewards(self, states):
+        """
+            Method to calculate the rows of the sparse reward table of states
+            Algorithm:
+                1. mask the goal states and the negative reward states among states
+                2. set the reward for the goal states to absorbing_state for all actions as 1,
+                   and for the negative reward states as -1.
+
+        :param states: Array of states
+        :return: rewards as a numpy array of shape number of states * n_actions * 1
+        """
+
+        tiles = self._tiles(states)
+
+        rewards = np.zeros((states.size, self.n_actions, 1), dtype=float_dtype())
+        rewards[tiles == '$'] = 1
+        rewards[tiles == '£'] = -1
+
+        return rewards
+
+    def _tiles(self, states):
+        """
+            Method to look up the tiles of states in the world, without going through the whole world
+
+        :param states: Array of states
+        :return: Array of the tiles of the states, ' ' for the absorbing state
+        """
+
+        tiles = np.full(states.size, ' ')
+        cells = states < self.world.size
+        tiles[cells] = self.world.reshape(-1)[states[cells]]
+
+        return tiles
+
+    def _reward_states(self, states=None):
+        """
+            Method to find the goal states and the negative reward states of the world among states
+
+        :param states: Array of states, all the states if None (optional)
+        :return: Arrays of the goal states and the negative reward states as a tuple
+        """
+
+        world = self.world.reshape(-1)
+        goals, negative_rewards = np.flatnonzero(world == '$'), np.flatnonzero(world == '£')
+
+        if states is None:
+            return goals, negative_rewards
+
+        return np.intersect1d(goals, states), np.intersect1d(negative_rewards, states)
+
+    def _next_states(self, states):
+        """
+            Method to calculate the next state of states for every action with whole grid numpy operations
+            Algorithm:
+                1. the next state of the absorbing state, goal states and negative reward states is the absorbing state
+                2. calculate the next state of every other cell for each move direction (up, down, left, right),
+                   moves that would leave the grid stay where you are (see move_indices())
+                3. mask the moves that start from or end in an obstacle, these stay where you are
+
+        :param states: Array of states
+        :return: next states as a numpy array of shape number of states * n_actions
+        """
+
+        world = self.world.reshape(-1)
+        terminals = np.isin(self._tiles(states), ('£', '$', ' '))
+
+        next_states = np.full((states.size, self.n_actions), self.absorbing_state)
+        cells = states[~terminals]
+
+        moves, _ = move_indices(self.rows, self.columns, self.actions, cells)
+        blocked = (world[moves] == '#') | (world[cells] == '#').reshape(-1, 1)
+        next_states[~terminals] = np.where(blocked, cells.reshape(-1, 1), moves)
+
+        return next_states
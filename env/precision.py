@@ -0,0 +1,98 @@
+import contextlib
+
+import numpy as np
+
+_precisions = {'float64': np.float64, 'float32': np.float32}
+_precision = 'float64'
+
+
+def set_precision(precision):
+    """
+        Method to set the numeric precision of the package
+        With 'float32', the models created by the environments (probabilities, rewards), the values, Q-tables and
+        weights of the algorithms are float32, the next states of the sparse successor tables are int32 and the
+        policies are int8 (int16 for more than 128 actions), so that they use half of the memory of 'float64' and the
+        numpy operations move half of the bytes.
+        The models use the precision set when the environment is created, the algorithms the precision set when they
+        are called
+        Throws an exception if the precision is not valid
+
+    :param precision: 'float64' (default) or 'float32'
+    :return: None
+    """
+
+    global _precision
+
+    if precision not in _precisions:
+        raise Exception('Invalid Precision!!!')
+
+    _precision = precision
+
+
+def get_precision():
+    """
+        Method to get the numeric precision of the package (see set_precision())
+
+    :return: 'float64' or 'float32'
+    """
+
+    return _precision
+
+
+@contextlib.contextmanager
+def precision(precision):
+    """
+        Method to set the numeric precision of the package inside a with block, e.g. to compare the results of an
+        algorithm with both precisions
+
+    :param precision: 'float64' or 'float32'
+    :return: None
+    """
+
+    original = get_precision()
+    set_precision(precision)
+    try:
+        yield
+    finally:
+        set_precision(original)
+
+
+def float_dtype():
+    """
+        Method to get the floating point type of models, values, Q-tables and weights for the numeric precision
+
+    :return: numpy floating point type
+    """
+
+    return _precisions[_precision]
+
+
+def policy_dtype(n_actions):
+    """
+        Method to get the integer type of policies for the numeric precision, the default integer type for 'float64'
+        and the smallest integer type that holds the actions for 'float32'
+
+    :param n_actions: Number of possible actions
+    :return: numpy integer type
+    """
+
+    if _precision == 'float64':
+        return int
+
+    return np.int8 if n_actions <= np.iinfo(np.int8).max + 1 else np.int16 if n_actions <= np.iinfo(np.int16).max + 1 \
+        else np.int32
+
+
+def index_dtype(n_states):
+    """
+        Method to get the integer type of the next states of the sparse successor tables for the numeric precision,
+        the default integer type for 'float64' and int32 for 'float32' if it holds the states
+
+    :param n_states: Number of states
+    :return: numpy integer type
+    """
+
+    if _precision == 'float64' or n_states > np.iinfo(np.int32).max:
+        return int
+
+    return np.int32
@@ -0,0 +1,122 @@
+import numpy as np
+
+
+class VectorEnvironment:
+    """
+        Wrapper for env to step a number of independent copies of the environment in lockstep
+        The copies (slots) share the model of env, while their states, step counters and random number streams are
+        stored in arrays, so that a step of all the slots is a handful of numpy operations
+    """
+
+    # Constants of the SplitMix64 random number generator used for the random number stream of each slot
+    _increment = np.uint64(0x9E3779B97F4A7C15)
+    _multipliers = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+    def __init__(self, env, n_envs, seed=None):
+        """
+            Constructor for VectorEnvironment
+            1. initialization
+                - get the sampling tables of env to draw the next states (see EnvironmentModel.get_sampling_tables())
+                - cache the cumulative probabilities of the starting states from the distribution(pi) of env
+                - seed the random number stream of each slot with a seed sequence, the stream of a slot only depends
+                  on the seed and the index of the slot, not on the number of slots
+                - reset all the slots to a starting state
+
+        :param env: Environment with an absorbing state to be copied, e.g. FrozenLake or GridWorld
+        :param n_envs: Number of copies of the environment stepped in lockstep
+        :param seed: A seed to control the random number generators (optional)
+        """
+
+        self.env = env
+        self.n_envs = n_envs
+
+        self.n_states = self.env.n_states
+        self.n_actions = self.env.n_actions
+        self.max_steps = self.env.max_steps
+        self.absorbing_state = self.env.absorbing_state
+
+        self._successors, self._cumulative_p, self._rewards = self.env.get_sampling_tables()
+
+        self._start_states = np.flatnonzero(self.env.pi)
+        self._start_cumulative_p = np.cumsum(self.env.pi[self._start_states])
+        self._start_cumulative_p /= self._start_cumulative_p[-1]
+
+        self._random_states = np.random.SeedSequence(seed).generate_state(self.n_envs, dtype=np.uint64)
+
+        self.n_steps = np.zeros(self.n_envs, dtype=int)
+        self.states = self._draw_start_states(self._uniform())
+
+    def reset(self):
+        """
+            Method to reset all the slots to a starting state
+            Draws random states using the probability distribution(pi) of starting states
+
+        :return: Starting states of the slots after reset
+        """
+
+        self.n_steps[:] = 0
+        self.states = self._draw_start_states(self._uniform())
+        return self.states
+
+    def step(self, actions):
+        """
+            Method to perform an action in each slot on its current state
+            Throws an exception if any of the actions is not valid
+            Algorithm:
+                1. draw a uniform random number for each slot and search it in the cumulative probabilities of the
+                   successors of its state and action to get the next state and reward
+                2. a slot is done if the next state is the absorbing state or the maximum number of steps is reached
+                3. reset the slots that are done to a starting state, so that self.states holds the current states
+                   for the next step
+
+        :param actions: Array of the actions to be taken in each slot
+        :return: next states, rewards & boolean array to indicate if the game is over in each slot,
+                 the next states are the ones reached before the slots that are done are reset
+        """
+
+        actions = np.asarray(actions)
+        if np.any((actions < 0) | (actions >= self.n_actions)):
+            raise Exception('Invalid Action!!!')
+
+        uniform = self._uniform()
+        start_uniform = self._uniform()
+
+        i = np.sum(self._cumulative_p[self.states, actions] <= uniform.reshape(-1, 1), axis=1)
+        next_states = self._successors[self.states, actions, i]
+        rewards = self._rewards[self.states, actions, i]
+
+        self.n_steps += 1
+        done = (next_states == self.absorbing_state) | (self.n_steps >= self.max_steps)
+
+        self.states = np.where(done, self._draw_start_states(start_uniform), next_states)
+        self.n_steps[done] = 0
+
+        return next_states, rewards, done
+
+    def _draw_start_states(self, uniform):
+        """
+            Method to draw a starting state for each slot using the cumulative probabilities of the starting states
+
+        :param uniform: Array of a uniform random number for each slot
+        :return: Starting states of the slots
+        """
+
+        return self._start_states[self._start_cumulative_p.searchsorted(uniform, side='right')]
+
+    def _uniform(self):
+        """
+            Method to draw a uniform random number between 0 and 1 from the random number stream of each slot
+            Advances the SplitMix64 state of every slot and uses the 53 high bits of its output
+
+        :return: Array of a uniform random number for each slot
+        """
+
+        self._random_states += self._increment
+
+        z = self._random_states ^ (self._random_states >> np.uint64(30))
+        z *= self._multipliers[0]
+        z ^= z >> np.uint64(27)
+        z *= self._multipliers[1]
+        z ^= z >> np.uint64(31)
+
+        return (z >> np.uint64(11)) * (1.0 / (1 << 53))
@@ -2,6 +2,7 @@ from algorithms.linear_wrapper import LinearWrapper
 from algorithms.model_based_tabular_algorithms import policy_iteration, value_iteration
 from algorithms.model_free_non_tabular_algorithms import linear_q_learning, linear_sarsa
 from algorithms.model_free_tabular_algorithms import sarsa, q_learning
+from algorithms.sweep import print_sweep, run_sweep
 from env.frozenlake_environment import FrozenLake
 
 
@@ -146,5 +147,23 @@ def big_lake_implementation():
     linear_env.render(policy, value)
 
 
-small_lake_implementation()
-big_lake_implementation()
+def sweep_implementation():
+    seed = 500
+
+    small_lake = [['&', '.', '.', '.'],
+                  ['.', '#', '.', '#'],
+                  ['.', '.', '.', '#'],
+                  ['#', '.', '.', '$']]
+
+    print('\n# Sweep of the small lake implementation\n')
+
+    grid = {'eta': [0.25, 0.5, 0.75], 'epsilon': [0.25, 0.5], 'gamma': [0.9]}
+    table = run_sweep(small_lake, ['sarsa', 'q_learning', 'linear_sarsa', 'linear_q_learning', 'policy_iteration',
+                                   'value_iteration'], grid, n_seeds=20, seed=seed)
+    print_sweep(table)
+
+
+if __name__ == '__main__':
+    small_lake_implementation()
+    big_lake_implementation()
+    # sweep_implementation()
@@ -0,0 +1,801 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+from algorithms.linear_wrapper import LinearWrapper
+from algorithms.model_based_tabular_algorithms import affected_states, batched_value_iteration, \
+    modified_policy_iteration, multigrid_value_iteration, policy_evaluation, policy_iteration, \
+    replan_policy_iteration, replan_value_iteration, topological_value_iteration, value_iteration
+from algorithms.model_free_non_tabular_algorithms import linear_q_lambda, linear_q_learning, linear_replay_q_learning, \
+    linear_sarsa, linear_sarsa_lambda
+from algorithms.model_free_tabular_algorithms import batched_q_learning, batched_sarsa, q_lambda, q_learning, \
+    replay_q_learning, sarsa, sarsa_lambda
+from algorithms.parallel_planning import parallel_policy_evaluation, parallel_value_iteration
+from algorithms.successor_representation import SuccessorRepresentation
+from env.compact_environment import CompactEnvironment
+from env.env_helper import generate_lake, generate_maze, model_memory
+from env.frozenlake_environment import FrozenLake
+from env.gridworld_environment import GridWorld
+from env.precision import precision
+from env.vector_environment import VectorEnvironment
+
+small_lake = [['&', '.', '.', '.'],
+              ['.', '#', '.', '#'],
+              ['.', '.', '.', '#'],
+              ['#', '.', '.', '$']]
+
+big_lake = [['&', '.', '.', '.', '.', '.', '.', '.'],
+            ['.', '.', '.', '.', '.', '.', '.', '.'],
+            ['.', '.', '.', '#', '.', '.', '.', '.'],
+            ['.', '.', '.', '.', '.', '#', '.', '.'],
+            ['.', '.', '.', '#', '.', '.', '.', '.'],
+            ['.', '#', '#', '.', '.', '.', '#', '.'],
+            ['.', '#', '.', '.', '#', '.', '#', '.'],
+            ['.', '.', '.', '#', '.', '.', '.', '$']]
+
+
+def benchmark_lakes(generated_sizes=(64,), seed=0):
+    """
+        Method to create the lakes used by the planning benchmarks, the small lake and the big lake with a dense model
+        and generated lakes with a sparse model
+
+    :param generated_sizes: Number of rows and columns of the generated lakes
+    :param seed: A seed to control the random number generator used to generate the lakes
+    :return: list of name, FrozenLake tuples
+    """
+
+    lakes = [('small lake', FrozenLake(small_lake, 0.1, 16, seed=seed)),
+             ('big lake', FrozenLake(big_lake, 0.1, 64, seed=seed))]
+
+    for size in generated_sizes:
+        lake = generate_lake(size, size, seed=seed)
+        lakes.append(('{0}x{0} lake'.format(size), FrozenLake(lake, 0.1, size * size, seed=seed, sparse=True)))
+
+    return lakes
+
+
+def timed(function, *args, **kwargs):
+    """
+        Method to call a function and measure the wall time it takes
+
+    :param function: function to be called
+    :param args: Non Keyword Arguments of the function
+    :param kwargs: Keyword Arguments of the function
+    :return: result of the function, wall time in seconds
+    """
+
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def counted(env):
+    """
+        Method to count the steps taken in env, by wrapping the step method of the instance
+
+    :param env: Environment whose steps should be counted
+    :return: list holding the number of steps taken since the call, updated by every step
+    """
+
+    n_steps = [0]
+    step = env.step
+
+    def counted_step(action):
+        n_steps[0] += 1
+        return step(action)
+
+    env.step = counted_step
+    return n_steps
+
+
+def linear(algorithm):
+    """
+        Method to wrap a linear algorithm, so that it is called with an environment and returns the policy and value
+        decoded from its weights, like the tabular algorithms
+
+    :param algorithm: Linear algorithm that is called with a LinearWrapper and returns the weights
+    :return: function of env and the arguments of the algorithm that returns the policy and value
+    """
+
+    def run(env, *args, **kwargs):
+        linear_env = LinearWrapper(env)
+        return linear_env.decode_policy(algorithm(linear_env, *args, **kwargs))
+
+    run.__name__ = algorithm.__name__
+    return run
+
+
+def wrong_actions(lake, policy, optimal_policy):
+    """
+        Method to count the frozen tiles (start included) of a lake where the policy does not take the optimal action
+
+    :param lake: Lake as a 2D list
+    :param policy: Policy to be checked
+    :param optimal_policy: Optimal policy of the lake
+    :return: number of frozen tiles with a wrong action, number of frozen tiles
+    """
+
+    frozen = np.isin(np.array(lake).reshape(-1), ('.', '&'))
+    return np.count_nonzero((np.asarray(policy)[:-1] != np.asarray(optimal_policy)[:-1]) & frozen), np.sum(frozen)
+
+
+def benchmark_model_construction(sizes=(8, 16, 32, 64, 128, 256), max_dense_size=32, seed=0):
+    """
+        Method to benchmark the time to construct the FrozenLake and GridWorld models for square grids of
+        increasing size. The dense model is only constructed up to max_dense_size, as its memory grows with
+        the square of the grid area.
+
+    :param sizes: Number of rows and columns of the generated grids
+    :param max_dense_size: Biggest size for which the dense model is constructed
+    :param seed: A seed to control the random number generator used to generate the grids
+    :return: None
+    """
+
+    print('{:>6} {:>8} {:>18} {:>18} {:>18} {:>18}'.format('size', 'states', 'FrozenLake dense', 'FrozenLake sparse',
+                                                            'GridWorld dense', 'GridWorld sparse'))
+
+    for size in sizes:
+        lake = generate_lake(size, size, seed=seed)
+        times = []
+
+        for env_class, args in ((FrozenLake, (lake, 0.1, size * size)), (GridWorld, (lake, size * size))):
+            for sparse in (False, True):
+                if sparse or size <= max_dense_size:
+                    _, seconds = timed(env_class, *args, sparse=sparse)
+                    times.append('{:.4f}s'.format(seconds))
+                else:
+                    times.append('-')
+
+        print('{:>6} {:>8} {:>18} {:>18} {:>18} {:>18}'.format(size, size * size + 1, *times))
+
+
+def benchmark_vector_environment(size=64, n_envs=(1, 100, 1000, 10000, 100000), n_steps=100, seed=0):
+    """
+        Method to benchmark the number of transitions per second of FrozenLake.step() against VectorEnvironment.step()
+        for an increasing number of slots, with random actions on a generated lake
+
+    :param size: Number of rows and columns of the generated lake
+    :param n_envs: Number of slots of the VectorEnvironment
+    :param n_steps: Number of steps taken
+    :param seed: A seed to control the random number generators
+    :return: None
+    """
+
+    env = FrozenLake(generate_lake(size, size, seed=seed), 0.1, size * size, seed=seed, sparse=True)
+    random_state = np.random.RandomState(seed)
+
+    def _step_env(actions):
+        for action in actions:
+            _, _, done = env.step(action)
+            if done:
+                env.reset()
+
+    def _step_vector_env(vector_env, actions):
+        for action in actions:
+            vector_env.step(action)
+
+    env.reset()
+    _, seconds = timed(_step_env, random_state.randint(0, env.n_actions, n_steps * 100))
+    print('{:>26} {:>8.3f}M transitions/s'.format('FrozenLake', n_steps * 100 / seconds / 1e6))
+
+    for n in n_envs:
+        vector_env = VectorEnvironment(env, n, seed=seed)
+        _, seconds = timed(_step_vector_env, vector_env, random_state.randint(0, env.n_actions, (n_steps, n)))
+        print('{:>26} {:>8.3f}M transitions/s'.format('VectorEnvironment({})'.format(n), n_steps * n / seconds / 1e6))
+
+
+def benchmark_bellman_backups(gamma=0.9, theta=0.001, max_iterations=1000):
+    """
+        Method to benchmark the in place (Gauss-Seidel) updates against the synchronous (Jacobi) updates of
+        value_iteration and policy_evaluation on the small lake, the big lake and a generated 64x64 lake
+
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :return: None
+    """
+
+    print('{:>12} {:>18} {:>12} {:>12} {:>9}'.format('lake', 'planner', 'in place', 'synchronous', 'speedup'))
+
+    for name, env in benchmark_lakes():
+        policy, _ = value_iteration(env, gamma, theta, max_iterations, synchronous=True)
+
+        for function, args in ((value_iteration, (env, gamma, theta, max_iterations)),
+                               (policy_evaluation, (env, policy, gamma, theta, max_iterations))):
+            _, in_place = timed(function, *args)
+            _, synchronous = timed(function, *args, synchronous=True)
+            print('{:>12} {:>18} {:>11.4f}s {:>11.4f}s {:>8.1f}x'.format(name, function.__name__, in_place, synchronous,
+                                                                         in_place / synchronous))
+
+
+def benchmark_modified_policy_iteration(ks=(0, 1, 2, 5, 10, 20, 50, 100), gamma=0.9, theta=0.001, max_iterations=1000):
+    """
+        Method to benchmark the number of iterations, evaluation sweeps and wall time of modified_policy_iteration
+        for increasing number k of evaluation sweeps for each policy
+
+    :param ks: Maximum numbers of evaluation sweeps for each policy
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of policy improvements
+    :return: None
+    """
+
+    print('{:>12} {:>5} {:>11} {:>8} {:>10}'.format('lake', 'k', 'iterations', 'sweeps', 'time'))
+
+    for name, env in benchmark_lakes():
+        for k in ks:
+            (_, _, iterations, sweeps), seconds = timed(modified_policy_iteration, env, gamma, theta, max_iterations, k)
+            print('{:>12} {:>5} {:>11} {:>8} {:>9.4f}s'.format(name, k, iterations, sweeps, seconds))
+
+
+def benchmark_exact_policy_iteration(generated_sizes=(32, 64), gamma=0.9, theta=0.001, max_iterations=1000):
+    """
+        Method to check that policy_iteration with exact policy evaluation finds the values of value_iteration to
+        within theta, on lakes with a dense model and generated lakes with more than 256 states whose policies are
+        evaluated with the iterative solver. Both planners are run so that their values are within theta / 2 of the
+        optimal values: value_iteration stops when the maximum difference is below theta / 2 * (1 - γ) / γ
+
+    :param generated_sizes: Number of rows and columns of the generated lakes
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold of the maximum difference between the values of the planners
+    :param max_iterations: Maximum number of iterations
+    :return: None
+    """
+
+    print('{:>12} {:>8} {:>18} {:>16} {:>14} {:>13}'.format('lake', 'states', 'exact iteration', 'value iteration',
+                                                            'difference', 'within theta'))
+
+    for name, env in benchmark_lakes(generated_sizes):
+        (_, exact_value), exact = timed(policy_iteration, env, gamma, theta / 2, max_iterations, exact=True)
+        (_, value), seconds = timed(value_iteration, env, gamma, theta / 2 * (1 - gamma) / gamma, max_iterations)
+        difference = np.max(np.abs(exact_value - value))
+        print('{:>12} {:>8} {:>17.4f}s {:>15.4f}s {:>14.6f} {:>13}'.format(name, env.n_states, exact, seconds,
+                                                                          difference, str(difference < theta)))
+
+
+def benchmark_batched_value_iteration(sizes=(8, 32), slips=np.linspace(0., 0.5, 10), gammas=np.linspace(0.5, 0.95, 10),
+                                      theta=0.001, max_iterations=1000, seed=0):
+    """
+        Method to benchmark batched_value_iteration against a loop of synchronous value_iteration over every pair of
+        a slip and a discount factor, on generated lakes
+
+    :param sizes: Number of rows and columns of the generated lakes
+    :param slips: Probabilities of slipping of the models
+    :param gammas: Parameters to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to generate the lakes
+    :return: None
+    """
+
+    print('{:>12} {:>7} {:>12} {:>12} {:>9}'.format('lake', 'pairs', 'loop', 'batched', 'speedup'))
+
+    for size in sizes:
+        lake = generate_lake(size, size, seed=seed)
+        envs = [FrozenLake(lake, slip, size * size, seed=seed, sparse=True) for slip in slips]
+
+        def _loop():
+            return [value_iteration(env, gamma, theta, max_iterations, synchronous=True)
+                    for env in envs for gamma in gammas]
+
+        _, loop = timed(_loop)
+        _, batched = timed(batched_value_iteration, envs, gammas, theta, max_iterations)
+        name, pairs = '{0}x{0} lake'.format(size), len(slips) * len(gammas)
+        print('{:>12} {:>7} {:>11.4f}s {:>11.4f}s {:>8.1f}x'.format(name, pairs, loop, batched, loop / batched))
+
+
+def benchmark_successor_representation(n_goals=(1, 10, 100), gamma=0.9, theta=0.001, max_iterations=1000, seed=0):
+    """
+        Method to benchmark the planning for many goal tiles on the big lake, creating a FrozenLake with the goal moved
+        to each tile and running policy_iteration, against the values and the improved policies of the optimal policy
+        of the big lake for the rewards of each goal tile calculated with SuccessorRepresentation
+
+    :param n_goals: Numbers of goal tiles, chosen at random among the frozen tiles
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to choose the goal tiles
+    :return: None
+    """
+
+    env = FrozenLake(big_lake, 0.1, 64, seed=seed)
+    policy, _ = policy_iteration(env, gamma, theta, max_iterations, synchronous=True)
+    frozen_tiles = np.flatnonzero(env.lake.reshape(-1) == '.')
+
+    successor_representation, setup = timed(SuccessorRepresentation, env, policy, gamma)
+    print('SuccessorRepresentation of the big lake created in {:.4f}s'.format(setup))
+    print('{:>6} {:>17} {:>24}'.format('goals', 'policy_iteration', 'SuccessorRepresentation'))
+
+    for n in n_goals:
+        goals = np.random.RandomState(seed).choice(frozen_tiles, n, replace=n > frozen_tiles.size)
+
+        def _policy_iteration():
+            for goal in goals:
+                lake = np.where(env.lake == '$', '.', env.lake)
+                lake.reshape(-1)[goal] = '$'
+                policy_iteration(FrozenLake(lake, 0.1, 64, seed=seed), gamma, theta, max_iterations, synchronous=True)
+
+        rewards = np.zeros((n, env.n_states, env.n_actions), dtype=float)
+        rewards[np.arange(n), goals] = 1.
+
+        _, loop = timed(_policy_iteration)
+        _, batched = timed(successor_representation.policy_improvement, rewards)
+        print('{:>6} {:>16.4f}s {:>23.4f}s'.format(n, loop, batched))
+
+
+def benchmark_replanning(size=64, n_tiles=(1, 4, 16), gamma=0.9, theta=0.001, max_iterations=1000, seed=0):
+    """
+        Method to benchmark planning from zero values on a new FrozenLake against updating the tiles of the
+        FrozenLake in place and re-planning from the previous policy and values, when random frozen tiles of a
+        generated lake become holes
+
+    :param size: Number of rows and columns of the generated lake
+    :param n_tiles: Numbers of tiles that become holes
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generators
+    :return: None
+    """
+
+    lake = generate_lake(size, size, seed=seed)
+    frozen_tiles = np.argwhere(np.array(lake) == '.')
+
+    print('{:>6} {:>9} {:>18} {:>12} {:>12} {:>12}'.format('tiles', 'affected', 'planner', 'new lake', 'set_tiles',
+                                                            're-planning'))
+
+    for n in n_tiles:
+        positions = frozen_tiles[np.random.RandomState(seed).choice(len(frozen_tiles), n, replace=False)]
+        tiles = {tuple(position): '#' for position in positions}
+
+        new_lake = np.array(lake)
+        new_lake[tuple(positions.T)] = '#'
+
+        for planner, replanner in ((value_iteration, replan_value_iteration),
+                                   (policy_iteration, replan_policy_iteration)):
+            env = FrozenLake(lake, 0.1, size * size, seed=seed, sparse=True)
+            policy, value = planner(env, gamma, theta, max_iterations, synchronous=True)
+
+            def _new_lake():
+                planner(FrozenLake(new_lake, 0.1, size * size, seed=seed, sparse=True), gamma, theta, max_iterations,
+                        synchronous=True)
+
+            _, cold = timed(_new_lake)
+            changed_states, update = timed(env.set_tiles, tiles)
+
+            if planner is value_iteration:
+                _, warm = timed(replanner, env, changed_states, value, gamma, theta, max_iterations)
+            else:
+                _, warm = timed(replanner, env, changed_states, policy, value, gamma, theta, max_iterations)
+
+            print('{:>6} {:>9} {:>18} {:>11.4f}s {:>11.4f}s {:>11.4f}s'.format(
+                n, affected_states(env, changed_states).size, planner.__name__, cold, update, warm))
+
+
+def benchmark_compaction(size=128, hole_probabilities=(0.1, 0.3, 0.4), gamma=0.9, theta=0.001, max_iterations=1000,
+                         seed=0):
+    """
+        Method to benchmark value_iteration on FrozenLake and GridWorld against CompactEnvironment, for generated
+        grids with an increasing number of holes (obstacles in GridWorld), which wall off more and more cells from
+        the start
+
+    :param size: Number of rows and columns of the generated grids
+    :param hole_probabilities: Probabilities of a tile being a hole
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to generate the grids
+    :return: None
+    """
+
+    print('{:>12} {:>6} {:>8} {:>10} {:>12} {:>12} {:>12}'.format('env', 'holes', 'states', 'reachable',
+                                                                   'compaction', 'full', 'compact'))
+
+    for hole_probability in hole_probabilities:
+        lake = generate_lake(size, size, hole_probability, seed=seed)
+
+        for env in (FrozenLake(lake, 0.1, size * size, seed=seed, sparse=True),
+                    GridWorld(lake, size * size, seed=seed, sparse=True)):
+            compact_env, compaction = timed(CompactEnvironment, env, seed=seed)
+            _, full = timed(value_iteration, env, gamma, theta, max_iterations, synchronous=True)
+            _, compact = timed(value_iteration, compact_env, gamma, theta, max_iterations, synchronous=True)
+
+            print('{:>12} {:>6} {:>8} {:>10} {:>11.4f}s {:>11.4f}s {:>11.4f}s'.format(
+                type(env).__name__, hole_probability, env.n_states, compact_env.n_states, compaction, full, compact))
+
+
+def benchmark_topological_value_iteration(sizes=(33, 65, 129), gamma=0.9, theta=0.001, max_iterations=1000, seed=0):
+    """
+        Method to benchmark topological_value_iteration against synchronous value_iteration on FrozenLake and GridWorld
+        for open generated grids and generated mazes of increasing size. It is slower on the open grids, which are
+        mostly one large component, and only breaks even or wins slightly on the mazes
+
+    :param sizes: Number of rows and columns of the generated grids, odd for the mazes
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to generate the grids
+    :return: None
+    """
+
+    print('{:>12} {:>12} {:>8} {:>16} {:>12} {:>12}'.format('grid', 'env', 'states', 'value_iteration',
+                                                            'topological', 'speedup'))
+
+    for size in sizes:
+        grids = (('open', generate_lake(size, size, seed=seed)), ('maze', generate_maze(size, size, seed=seed)))
+
+        for name, grid in grids:
+            for env in (FrozenLake(grid, 0.1, size * size, seed=seed, sparse=True),
+                        GridWorld(grid, size * size, seed=seed, sparse=True)):
+                env.get_expected_rewards()
+                _, synchronous = timed(value_iteration, env, gamma, theta, max_iterations, synchronous=True)
+                _, topological = timed(topological_value_iteration, env, gamma, theta, max_iterations)
+
+                print('{:>12} {:>12} {:>8} {:>15.4f}s {:>11.4f}s {:>11.1f}x'.format(
+                    '{0} {1}x{1}'.format(name, size), type(env).__name__, env.n_states, synchronous, topological,
+                    synchronous / topological))
+
+
+def benchmark_multigrid_value_iteration(sizes=(128, 256, 512), gamma=0.99, theta=0.001, max_iterations=10000, seed=0):
+    """
+        Method to benchmark the total wall time of multigrid_value_iteration, including the coarse lakes, against
+        synchronous value_iteration from zero values on generated lakes of increasing size
+
+    :param sizes: Number of rows and columns of the generated lakes
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to generate the lakes
+    :return: None
+    """
+
+    print('{:>12} {:>16} {:>12} {:>9} {:>16}'.format('lake', 'value_iteration', 'multigrid', 'speedup',
+                                                     'max difference'))
+
+    for size in sizes:
+        env = FrozenLake(generate_lake(size, size, seed=seed), 0.1, size * size, seed=seed, sparse=True)
+        env.get_expected_rewards()
+
+        (_, cold_value), cold = timed(value_iteration, env, gamma, theta, max_iterations, synchronous=True)
+        (_, value), multigrid = timed(multigrid_value_iteration, env, gamma, theta, max_iterations)
+
+        print('{:>12} {:>15.4f}s {:>11.4f}s {:>8.1f}x {:>16.4f}'.format('{0}x{0} lake'.format(size), cold, multigrid,
+                                                                      cold / multigrid,
+                                                                      np.max(np.abs(value - cold_value))))
+
+
+def benchmark_parallel_planning(sizes=(256, 512), n_workers=(1, 2, 4, 8, 16), gamma=0.9, theta=0.001,
+                                max_iterations=1000, seed=0):
+    """
+        Method to benchmark the scaling of parallel_value_iteration and parallel_policy_evaluation from 1 to N worker
+        processes against synchronous value_iteration and policy_evaluation on generated lakes of increasing size
+        The speedup is limited by the number of CPUs of the machine, which is printed first
+
+    :param sizes: Number of rows and columns of the generated lakes
+    :param n_workers: Numbers of worker processes
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to generate the lakes
+    :return: None
+    """
+
+    print('CPUs: {}'.format(os.cpu_count()))
+    print('{:>12} {:>8} {:>16} {:>10} {:>18} {:>10}'.format('lake', 'workers', 'value_iteration', 'speedup',
+                                                           'policy_evaluation', 'speedup'))
+
+    for size in sizes:
+        env = FrozenLake(generate_lake(size, size, seed=seed), 0.1, size * size, seed=seed, sparse=True)
+        env.get_expected_rewards()
+        name = '{0}x{0} lake'.format(size)
+
+        (policy, _), serial_iteration = timed(value_iteration, env, gamma, theta, max_iterations, synchronous=True)
+        _, serial_evaluation = timed(policy_evaluation, env, policy, gamma, theta, max_iterations, synchronous=True)
+
+        print('{:>12} {:>8} {:>15.4f}s {:>10} {:>17.4f}s {:>10}'.format(name, 'serial', serial_iteration, '',
+                                                                      serial_evaluation, ''))
+
+        for n in n_workers:
+            _, iteration = timed(parallel_value_iteration, env, gamma, theta, max_iterations, n_workers=n)
+            _, evaluation = timed(parallel_policy_evaluation, env, policy, gamma, theta, max_iterations, n_workers=n)
+
+            print('{:>12} {:>8} {:>15.4f}s {:>9.1f}x {:>17.4f}s {:>9.1f}x'.format(
+                name, n, iteration, serial_iteration / iteration, evaluation, serial_evaluation / evaluation))
+
+
+def benchmark_precision(sizes=(32, 128, 512), max_dense_size=32, gamma=0.9, theta=0.0001, max_iterations=1000, seed=0):
+    """
+        Method to benchmark the memory of the model and the time of synchronous value_iteration with the 'float32'
+        precision against the 'float64' precision on generated lakes of increasing size, and to validate the values and
+        policy found with 'float32' against the ones found with 'float64'
+
+    :param sizes: Number of rows and columns of the generated lakes
+    :param max_dense_size: Biggest size for which the dense model is constructed
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to generate the lakes
+    :return: None
+    """
+
+    print('{:>18} {:>10} {:>12} {:>16} {:>16} {:>15}'.format('lake', 'precision', 'model', 'value_iteration',
+                                                              'max difference', 'same policy'))
+
+    for size in sizes:
+        lake = generate_lake(size, size, seed=seed)
+
+        for sparse in (False, True):
+            if not sparse and size > max_dense_size:
+                continue
+
+            results = {}
+
+            for name in ('float64', 'float32'):
+                with precision(name):
+                    env = FrozenLake(lake, 0.1, size * size, seed=seed, sparse=sparse)
+                    model = env.get_sparse_prob_rewards() if sparse else env.get_prob_rewards()
+                    env.get_expected_rewards()
+
+                    (policy, value), seconds = timed(value_iteration, env, gamma, theta, max_iterations,
+                                                     synchronous=True)
+                    results[name] = policy, value
+
+                    print('{:>18} {:>10} {:>10.1f}MB {:>15.4f}s {:>16.2e} {:>14.2f}%'.format(
+                        '{0}x{0} {1}'.format(size, 'sparse' if sparse else 'dense'), name,
+                        sum(array.nbytes for array in model) / 2 ** 20, seconds,
+                        np.max(np.abs(value - results['float64'][1])),
+                        100 * np.mean(policy == results['float64'][0])))
+
+
+def benchmark_memory_budget(sizes=(16, 64, 256, 1024), memory_budget=64 * 2 ** 20, n_steps=10000, seed=0):
+    """
+        Method to benchmark the representation of the FrozenLake model selected automatically for a memory budget on
+        generated lakes of increasing size, with the estimated memory of each representation, the time to construct
+        the model and the number of steps per second of the selected representation
+
+    :param sizes: Number of rows and columns of the generated lakes
+    :param memory_budget: Memory budget of the model in bytes
+    :param n_steps: Number of steps taken with random actions
+    :param seed: A seed to control the random number generators
+    :return: None
+    """
+
+    random_state = np.random.RandomState(seed)
+
+    for size in sizes:
+        lake = generate_lake(size, size, seed=seed)
+        memory = model_memory(size * size + 1, 4, 4)
+        print('{0}x{0} lake, estimated memory: {1}'.format(size, ', '.join(
+            '{} {:.3g}MB'.format(representation, bytes / 2 ** 20) for representation, bytes in memory.items())))
+
+        env, construction = timed(FrozenLake, lake, 0.1, size * size, seed=seed, memory_budget=memory_budget)
+
+        env.reset()
+        start = time.perf_counter()
+        for action in random_state.randint(0, env.n_actions, n_steps):
+            _, _, done = env.step(action)
+            if done:
+                env.reset()
+        seconds = time.perf_counter() - start
+
+        print('{:>12} construction {:.4f}s, {:.3f}M steps/s'.format(env.representation, construction,
+                                                                   n_steps / seconds / 1e6))
+
+
+def benchmark_matrix_free(sizes=(256, 512, 1024), max_sparse_size=512, gamma=0.9, theta=0.001, max_iterations=1000,
+                          seed=0):
+    """
+        Method to benchmark synchronous value_iteration with the sparse model against the model calculated on the fly
+        on generated lakes of increasing size, with the estimated memory of each model, the time to construct it, the
+        time of value iteration and the maximum difference of the values
+
+    :param sizes: Number of rows and columns of the generated lakes
+    :param max_sparse_size: Maximum number of rows and columns of the lakes with a sparse model
+    :param gamma: Parameter to decay the future rewards
+    :param theta: Threshold that is used to identify when to stop
+    :param max_iterations: Maximum number of iterations
+    :param seed: A seed to control the random number generator used to generate the lakes
+    :return: None
+    """
+
+    print('{:>12} {:>12} {:>10} {:>14} {:>16} {:>16}'.format('lake', 'model', 'memory', 'construction',
+                                                             'value_iteration', 'max difference'))
+
+    for size in sizes:
+        lake = generate_lake(size, size, seed=seed)
+        memory = model_memory(size * size + 1, 4, 4)
+        sparse_value = None
+
+        for representation in ('sparse', 'on_the_fly'):
+            if representation == 'sparse' and size > max_sparse_size:
+                continue
+
+            env, construction = timed(FrozenLake, lake, 0.1, size * size, seed=seed, representation=representation)
+            if representation == 'sparse':
+                env.get_expected_rewards()
+
+            (_, value), seconds = timed(value_iteration, env, gamma, theta, max_iterations, synchronous=True)
+            if sparse_value is None:
+                sparse_value = value
+
+            print('{:>12} {:>12} {:>8.3g}MB {:>13.4f}s {:>15.4f}s {:>16.2e}'.format(
+                '{0}x{0} lake'.format(size), representation, memory[representation] / 2 ** 20, construction, seconds,
+                np.max(np.abs(value - sparse_value))))
+
+
+def benchmark_fast_td_control(sizes=(4, 8), max_episodes=2000, eta=0.5, gamma=0.9, epsilon=0.5, seed=0):
+    """
+        Method to benchmark the time of sarsa and q_learning with fast=False and fast=True on the small lake, the big
+        lake and generated lakes, with the maximum difference of their values to the values of value_iteration
+
+    :param sizes: Number of rows and columns of the lakes, the small and big lakes for 4 and 8
+    :param max_episodes: Maximum number of episodes
+    :param eta: Learning rate
+    :param gamma: Parameter to decay the future rewards
+    :param epsilon: Exploration factor
+    :param seed: A seed to control the random number generators
+    :return: None
+    """
+
+    print('{:>12} {:>12} {:>10} {:>10} {:>9} {:>16} {:>16}'.format('lake', 'algorithm', 'loop', 'fast', 'speedup',
+                                                                    'loop difference', 'fast difference'))
+
+    for size in sizes:
+        lake = {4: small_lake, 8: big_lake}.get(size) or generate_lake(size, size, seed=seed)
+        _, optimal_value = value_iteration(FrozenLake(lake, 0.1, size * size, sparse=True), gamma, 0.0001, 1000)
+
+        for algorithm in (sarsa, q_learning):
+            results = []
+            for fast in (False, True):
+                env = FrozenLake(lake, 0.1, size * size, seed=seed, sparse=True)
+                env.get_sampling_tables()
+                results.append(timed(algorithm, env, max_episodes, eta, gamma, epsilon, seed=seed, fast=fast))
+
+            ((_, loop_value), loop), ((_, fast_value), fast) = results
+            print('{:>12} {:>12} {:>9.4f}s {:>9.4f}s {:>8.1f}x {:>16.4f} {:>16.4f}'.format(
+                '{0}x{0} lake'.format(size), algorithm.__name__, loop, fast, loop / fast,
+                np.max(np.abs(loop_value - optimal_value)), np.max(np.abs(fast_value - optimal_value))))
+
+
+def benchmark_batched_td_control(n_envs=(16, 256, 4096), max_episodes=20000, eta=0.5, gamma=0.9, epsilon=0.5,
+                                 seed=0):
+    """
+        Method to benchmark the episodes per second of sarsa and q_learning against batched_sarsa and
+        batched_q_learning with an increasing number of copies of the small lake, with the maximum difference of their
+        values to the values of value_iteration
+
+    :param n_envs: Numbers of copies of the lake
+    :param max_episodes: Maximum number of episodes
+    :param eta: Learning rate
+    :param gamma: Parameter to decay the future rewards
+    :param epsilon: Exploration factor
+    :param seed: A seed to control the random number generators
+    :return: None
+    """
+
+    _, optimal_value = value_iteration(FrozenLake(small_lake, 0.1, 16, sparse=True), gamma, 0.0001, 1000)
+
+    print('{:>20} {:>8} {:>10} {:>12} {:>16}'.format('algorithm', 'n_envs', 'time', 'episodes/s', 'max difference'))
+
+    for algorithm, batched_algorithm in ((sarsa, batched_sarsa), (q_learning, batched_q_learning)):
+        runs = [(algorithm, 1, lambda env: algorithm(env, max_episodes, eta, gamma, epsilon, seed=seed, fast=True))]
+        runs += [(batched_algorithm, n, lambda env, n=n: batched_algorithm(env, max_episodes, eta, gamma, epsilon, n,
+                                                                            seed=seed)) for n in n_envs]
+
+        for function, n, run in runs:
+            env = FrozenLake(small_lake, 0.1, 16, seed=seed, sparse=True)
+            env.get_sampling_tables()
+            (_, value), seconds = timed(run, env)
+
+            print('{:>20} {:>8} {:>9.4f}s {:>12.0f} {:>16.4f}'.format(function.__name__, n, seconds,
+                                                                     max_episodes / seconds,
+                                                                     np.max(np.abs(value - optimal_value))))
+
+
+def benchmark_replay(max_episodes=(1000, 3000, 10000), eta=0.99, gamma=0.9, epsilon=0.99, seed=0):
+    """
+        Method to benchmark q_learning and linear_q_learning against replay_q_learning and linear_replay_q_learning
+        on the big lake, with the number of environment steps, the wall time and the number of frozen tiles where the
+        policy differs from the optimal policy in data/big_frozenlake_optimal_policy_value.npy
+
+    :param max_episodes: Maximum numbers of episodes
+    :param eta: Learning rate
+    :param gamma: Parameter to decay the future rewards
+    :param epsilon: Exploration factor
+    :param seed: A seed to control the random number generators
+    :return: None
+    """
+
+    optimal_policy = np.load('data/big_frozenlake_optimal_policy_value.npy', allow_pickle=True).tolist()['policy']
+
+    print('{:>26} {:>9} {:>10} {:>10} {:>14}'.format('algorithm', 'episodes', 'steps', 'time', 'wrong actions'))
+
+    for algorithm in (q_learning, replay_q_learning, linear(linear_q_learning), linear(linear_replay_q_learning)):
+        for episodes in max_episodes:
+            env = FrozenLake(big_lake, 0.1, 64, seed=seed)
+            n_steps = counted(env)
+            (policy, _), seconds = timed(algorithm, env, episodes, eta, gamma, epsilon, seed=seed)
+
+            print('{:>26} {:>9} {:>10} {:>9.2f}s {:>9}/{}'.format(algorithm.__name__, episodes, n_steps[0], seconds,
+                                                                 *wrong_actions(big_lake, policy, optimal_policy)))
+
+
+def benchmark_eligibility_traces(max_episodes=(250, 500, 1000, 2000, 4000, 8000), eta=0.5, gamma=0.9, epsilon=0.5,
+                                 lambda_=0.9, tolerance=0.05, seed=0):
+    """
+        Method to benchmark the episodes needed by sarsa_lambda, q_lambda and their linear variants to reach a near
+        optimal policy on the big lake, against the one-step algorithms
+        The greedy policy of each run is evaluated on the model of the lake, and the episodes to optimal are the
+        smallest number of episodes whose policy has a value of the starting state within tolerance of the value of
+        the optimal policy in data/big_frozenlake_optimal_policy_value.npy
+
+    :param max_episodes: Maximum numbers of episodes, in increasing order
+    :param eta: Learning rate
+    :param gamma: Parameter to decay the future rewards
+    :param epsilon: Exploration factor
+    :param lambda_: Trace decay of the trace based algorithms
+    :param tolerance: Relative tolerance of the value of the starting state of a near optimal policy
+    :param seed: A seed to control the random number generators
+    :return: None
+    """
+
+    optimal_value = np.load('data/big_frozenlake_optimal_policy_value.npy', allow_pickle=True).tolist()['value']
+    model = FrozenLake(big_lake, 0.1, 64)
+
+    runs = [(sarsa, ()), (sarsa_lambda, (lambda_,)), (q_learning, ()), (q_lambda, (lambda_,)),
+            (linear(linear_sarsa), ()), (linear(linear_sarsa_lambda), (lambda_,)),
+            (linear(linear_q_learning), ()), (linear(linear_q_lambda), (lambda_,))]
+
+    print('{:>20} {}  {:>18}'.format('algorithm', ' '.join('{:>7}'.format(episodes) for episodes in max_episodes),
+                                     'episodes to optimal'))
+
+    for algorithm, arguments in runs:
+        ratios = []
+        for episodes in max_episodes:
+            env = FrozenLake(big_lake, 0.1, 64, seed=seed)
+            policy, _ = algorithm(env, episodes, eta, gamma, epsilon, *arguments, seed=seed)
+            value = policy_evaluation(model, policy, gamma, 0.00001, 10000)
+            ratios.append(value[0] / optimal_value[0])
+
+        optimal = [episodes for episodes, ratio in zip(max_episodes, ratios) if ratio >= 1 - tolerance]
+        print('{:>20} {}  {:>18}'.format(algorithm.__name__, ' '.join('{:>7.3f}'.format(ratio) for ratio in ratios),
+                                         optimal[0] if optimal else '-'))
+
+
+benchmarks = [
+    benchmark_model_construction, benchmark_vector_environment, benchmark_bellman_backups,
+    benchmark_modified_policy_iteration, benchmark_exact_policy_iteration, benchmark_batched_value_iteration,
+    benchmark_successor_representation, benchmark_replanning, benchmark_compaction,
+    benchmark_topological_value_iteration, benchmark_multigrid_value_iteration, benchmark_parallel_planning,
+    benchmark_precision, benchmark_memory_budget, benchmark_matrix_free, benchmark_fast_td_control,
+    benchmark_batched_td_control, benchmark_replay, benchmark_eligibility_traces
+]
+
+
+def main(names):
+    """
+        Method to run the benchmarks given by name, without the benchmark_ prefix, e.g.
+        python run_benchmarks.py replay eligibility_traces
+        Runs the model construction benchmark if no name is given, and every benchmark for the name all
+        Throws an exception if a name is not a benchmark
+
+    :param names: Names of the benchmarks to be run
+    :return: None
+    """
+
+    by_name = {benchmark.__name__[len('benchmark_'):]: benchmark for benchmark in benchmarks}
+    names = ['model_construction'] if not names else list(by_name) if names == ['all'] else names
+
+    for name in names:
+        if name not in by_name:
+            raise Exception('Invalid Benchmark!!!')
+
+    for name in names:
+        print('\n# {}\n'.format(name))
+        by_name[name]()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])